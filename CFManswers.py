@@ -0,0 +1,85 @@
+# Author: Audric Deckers
+import json
+import os
+import sqlite3
+import time
+from CFMoracle import *
+
+class CFMAnswerStore:
+    """
+    Local SQLite store of the answers given to the recommendation system, keyed by the identity of the model and the
+    signature of the question (cfr. ConnectedPair.signature). Each answer is committed as soon as it is given, so
+    that an interrupted session can be resumed. The text of the question is stored with its answer: an answer whose
+    question changed since is invalidated.
+    """
+    def __init__(self, filename=None):
+        if filename is None:
+            directory = os.path.join(os.path.expanduser("~"), ".cache", "TFEmutaCOP")
+            os.makedirs(directory, exist_ok=True)
+            filename = os.path.join(directory, "answers.sqlite")
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS answers (model TEXT, signature TEXT, question TEXT, "
+                                "answer TEXT, time REAL, PRIMARY KEY (model, signature))")
+        self.connection.commit()
+
+    def key(self, question):
+        """
+        Returns the key of question in the store: its signature, or its text if it has none.
+        """
+        if 'signature' in question:
+            return json.dumps(question['signature'])
+        return question['question']
+
+    def get(self, model, question):
+        """
+        Returns the answer stored for question in model, None if there is none or if the question changed.
+        """
+        row = self.connection.execute("SELECT question, answer FROM answers WHERE model = ? AND signature = ?",
+                                      (model, self.key(question))).fetchone()
+        if row is None or row[0] != question['question']:
+            return None
+        return row[1]
+
+    def put(self, model, question, answer):
+        self.connection.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                                (model, self.key(question), question['question'], answer, time.time()))
+        self.connection.commit()
+
+    def answers(self, model):
+        """
+        Returns the number of answers stored for model.
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM answers WHERE model = ?", (model,)).fetchone()[0]
+
+    def forget(self, model):
+        self.connection.execute("DELETE FROM answers WHERE model = ?", (model,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+class CFMStoredOracle(CFMOracle):
+    """
+    Answers from store the questions already answered for model, and asks the other ones to oracle, storing its
+    answers. The number of answers taken from the store is kept in self.reused.
+    """
+    def __init__(self, store, model, oracle):
+        self.store = store
+        self.model = model
+        self.oracle = oracle
+        self.delay = oracle.delay
+        self.reused = 0
+
+    def answer(self, index, question, mutant):
+        answer = self.store.get(self.model, question)
+        if answer is not None:
+            self.reused += 1
+            return answer
+        answer = self.oracle.answer(index, question, mutant)
+        if normalise(answer) is not None:
+            self.store.put(self.model, question, normalise(answer))
+        return answer
+
+    def notify(self, index, question, survived):
+        self.oracle.notify(index, question, survived)
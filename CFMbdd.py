@@ -0,0 +1,190 @@
+# Author: Audric Deckers
+
+class CFMBddOverflow(Exception):
+    """
+    Raised when a diagram grows beyond the maximum number of nodes of its manager.
+    """
+    pass
+
+class CFMBdd:
+    """
+    Minimal reduced ordered binary decision diagram (ROBDD) manager. Nodes are integers indexing the var, low and
+    high arrays; 0 and 1 are the terminals. Variables are numbered by their position in the order (0 is the top),
+    and identical sub-diagrams are shared through the unique table. Operations are iterative so that models with
+    many variables do not hit the recursion limit. At most maxNodes nodes are created (None for no limit).
+    """
+    def __init__(self, nbrVariables, maxNodes=None):
+        self.nbrVariables = nbrVariables
+        self.maxNodes = maxNodes
+        # Terminals sit below every variable.
+        self.var = [nbrVariables, nbrVariables]
+        self.low = [0, 1]
+        self.high = [0, 1]
+        self.unique = {}
+        self.computed = {}
+
+    def node(self, var, low, high):
+        """
+        Returns the node testing var with the given children, reduced and shared.
+        """
+        if low == high:
+            return low
+        key = (var, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.var)
+            if self.maxNodes is not None and node >= self.maxNodes:
+                raise CFMBddOverflow("More than " + str(self.maxNodes) + " nodes.")
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = node
+        return node
+
+    def clause(self, literals):
+        """
+        Returns the disjunction of literals, given as (variable, polarity) pairs.
+        """
+        polarities = {}
+        for var, polarity in literals:
+            if polarities.get(var, polarity) != polarity:
+                return 1
+            polarities[var] = polarity
+        result = 0
+        for var in sorted(polarities, reverse=True):
+            result = self.node(var, 1, result) if not polarities[var] else self.node(var, result, 1)
+        return result
+
+    def atMostOne(self, variables):
+        """
+        Returns the function true when at most one of variables is true.
+        """
+        none, one = 1, 1
+        for var in sorted(set(variables), reverse=True):
+            # none: no variable seen so far is true; one: one already is.
+            none, one = self.node(var, none, one), self.node(var, one, 0)
+        return none
+
+    def apply(self, operator, f, g):
+        """
+        Returns f AND g or f OR g (operator is "and" or "or").
+        """
+        computed = self.computed.setdefault(operator, {})
+        var, low, high = self.var, self.low, self.high
+        results = []
+        stack = [(f, g, False)]
+        while stack:
+            f, g, expanded = stack.pop()
+            if not expanded:
+                result = self.terminalCase(operator, f, g)
+                if result is None:
+                    if f > g:
+                        f, g = g, f
+                    result = computed.get((f, g))
+                if result is not None:
+                    results.append(result)
+                    continue
+                top = min(var[f], var[g])
+                f0, f1 = (low[f], high[f]) if var[f] == top else (f, f)
+                g0, g1 = (low[g], high[g]) if var[g] == top else (g, g)
+                stack.append((f, g, True))
+                stack.append((f1, g1, False))
+                stack.append((f0, g0, False))
+            else:
+                low0 = results.pop(-2)
+                high1 = results.pop()
+                result = self.node(min(var[f], var[g]), low0, high1)
+                computed[(f, g)] = result
+                results.append(result)
+        return results[0]
+
+    def terminalCase(self, operator, f, g):
+        if operator == "and":
+            if f == 0 or g == 0:
+                return 0
+            if f == 1:
+                return g
+            if g == 1 or f == g:
+                return f
+        else:
+            if f == 1 or g == 1:
+                return 1
+            if f == 0:
+                return g
+            if g == 0 or f == g:
+                return f
+        return None
+
+    def conjoin(self, functions):
+        """
+        Returns the conjunction of functions, starting from the ones at the bottom of the order to keep the
+        intermediate diagrams small.
+        """
+        result = 1
+        for f in sorted(functions, key=lambda f: self.var[f], reverse=True):
+            result = self.apply("and", result, f)
+        return result
+
+    def reachable(self, root):
+        """
+        Returns the non-terminal nodes of root, from the top of the order to the bottom.
+        """
+        seen = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node > 1 and node not in seen:
+                seen.add(node)
+                stack.append(self.low[node])
+                stack.append(self.high[node])
+        return sorted(seen, key=lambda node: self.var[node])
+
+    def count(self, root, weights):
+        """
+        Returns the weighted model count of root and its partial derivatives with respect to the weight of the
+        true literal of the variables whose weights sum to 1 (the other entries are not meaningful).
+        weights[v] = (weight of v false, weight of v true); the weights of each variable must sum to 1 or 2,
+        so that skipping k variables of weight sum 2 multiplies by 2^k.
+        """
+        n = self.nbrVariables
+        var, low, high = self.var, self.low, self.high
+        doubled = [0] * (n + 1)
+        for v in range(n):
+            doubled[v + 1] = doubled[v] + (sum(weights[v]) == 2)
+        skip = lambda a, b: doubled[b] - doubled[a]
+
+        nodes = self.reachable(root)
+        value = {0: 0, 1: 1}
+        for node in reversed(nodes):
+            v = var[node]
+            w0, w1 = weights[v]
+            value[node] = (w0 * value[low[node]] << skip(v + 1, var[low[node]])) + \
+                          (w1 * value[high[node]] << skip(v + 1, var[high[node]]))
+        total = value[root] << skip(0, var[root])
+
+        # Reverse pass: adjoint of each node, then derivative of each variable, either tested by a node or
+        # skipped by an edge (whose term is then counted for each variable it skips, through a difference array).
+        adjoint = {node: 0 for node in nodes}
+        adjoint[root] = 1 << skip(0, var[root])
+        derivatives = [0] * (n + 1)
+        spans = [0] * (n + 1)
+        rootTerm = value[root] << skip(0, var[root])
+        spans[0] += rootTerm
+        spans[var[root]] -= rootTerm
+        for node in nodes:
+            v = var[node]
+            for child, w in [(low[node], weights[v][0]), (high[node], weights[v][1])]:
+                factor = adjoint[node] << skip(v + 1, var[child])
+                if child > 1:
+                    adjoint[child] += w * factor
+                term = w * factor * value[child]
+                spans[v + 1] += term
+                spans[var[child]] -= term
+            derivatives[v] += adjoint[node] * value[high[node]] << skip(v + 1, var[high[node]])
+        running = 0
+        for v in range(n):
+            running += spans[v]
+            if sum(weights[v]) == 1:
+                # Skipped variables of weight sum 1 leave the term unchanged when their true weight varies.
+                derivatives[v] += running
+        return total, derivatives[:n]
@@ -0,0 +1,122 @@
+# Author: Audric Deckers
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Version of the tool, part of the cache key so that entries written by another version are never reused.
+VERSION = "1.3"
+
+# Attributes of a CFMmodel stored in the cache: the parsed model, its registry and everything generated from it.
+CACHED_ATTRIBUTES = ["nodes", "contexts", "features", "registry", "cfmnodes", "cfmcontexts", "cfmfeatures",
+                     "mapping", "connectedPairs", "mutants", "questions", "mutationsLog"]
+
+# Permissions of a file created with open(), given to the published files (cfr. publish). The umask can only be read
+# by changing it for the whole process, so it is read once, at import, before any thread writes a file.
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+def temporaryFile(path, mode="w", **options):
+    """
+    Returns a (file object, name) temporary file opened with mode in the directory of path, to be moved to path
+    with publish once written, so that path is never read while partially written.
+    """
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    return os.fdopen(descriptor, mode, **options), temporary
+
+def publish(temporary, path):
+    """
+    Moves the temporary file to path atomically, with the permissions of a file created with open() (mkstemp
+    creates it readable by its owner only).
+    """
+    os.chmod(temporary, FILE_MODE)
+    os.replace(temporary, path)
+
+def contentKey(files, variant=""):
+    """
+    Returns a hash of the contents of files, of variant and of the tool version, identifying a model (cfr. CFMCache
+    and CFMserver.py).
+    """
+    digest = hashlib.sha256((VERSION + variant).encode())
+    for filename in files:
+        with open(filename, "rb") as f:
+            content = f.read()
+        # Length prefix so that moving bytes from one file to the next changes the key.
+        digest.update(str(len(content)).encode() + b":" + content)
+    return digest.hexdigest()
+
+class CFMCache:
+    """
+    Local cache of parsed models and generated mutants, keyed by a hash of the contents of the contexts, features
+    and mapping files and of the tool version. Entries are pickled, and the least recently used ones are evicted
+    when the cache directory grows beyond maxSize bytes.
+    """
+    def __init__(self, directory=None, maxSize=256 * 2**20):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".cache", "TFEmutaCOP")
+        self.directory = directory
+        self.maxSize = maxSize
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, files, variant=""):
+        """
+        Returns the key of the model made of files (contexts, features and mapping), built with the given variant
+        of the representation.
+        """
+        return contentKey(files, variant)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def load(self, key):
+        """
+        Returns the cached attributes of the model with key, or None on a miss.
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Corrupted or outdated entry, dropped.
+            os.remove(path)
+            return None
+        # Mark the entry as recently used.
+        os.utime(path)
+        return state
+
+    def store(self, key, state):
+        """
+        Stores the attributes of the model with key, then evicts the least recently used entries if needed.
+        """
+        f, temporary = temporaryFile(self.path(key), "wb")
+        with f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Atomic, so that concurrent runs never read a partially written entry (readable by its owner only).
+        os.replace(temporary, self.path(key))
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used entries (except keep) until the cache fits in maxSize bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.maxSize:
+                break
+            if name == str(keep) + ".pickle":
+                continue
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,115 @@
+# Author: Audric Deckers
+import http.client
+import json
+import socket
+from urllib.parse import urlencode
+
+class CFMServiceError(Exception):
+    """
+    Error answered by the service (cfr. CFMserver.py), with its HTTP status and JSON payload.
+    """
+    def __init__(self, status, payload):
+        super().__init__(str(status) + ": " + str(payload.get("error", payload)))
+        self.status = status
+        self.payload = payload
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix socket.
+    """
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+class CFMClient:
+    """
+    Client of the local analysis service, using only the standard library. The connection is kept alive between
+    requests; the methods return the decoded JSON answers and raise CFMServiceError on errors.
+    """
+    def __init__(self, host="127.0.0.1", port=8765, unixSocket=None, timeout=None):
+        if unixSocket is not None:
+            self.connection = UnixHTTPConnection(unixSocket, timeout=timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, body=None, **query):
+        query = {name: value for name, value in query.items() if value is not None}
+        if query:
+            path += "?" + urlencode(query)
+        data = None if body is None else json.dumps(body).encode()
+        headers = {} if data is None else {"Content-Type": "application/json"}
+        try:
+            self.connection.request(method, path, data, headers)
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # The kept alive connection was closed by the service, the request is sent again on a new one.
+            self.connection.close()
+            self.connection.request(method, path, data, headers)
+            response = self.connection.getresponse()
+        payload = json.loads(response.read() or b"{}")
+        if response.status != 200:
+            raise CFMServiceError(response.status, payload)
+        return payload
+
+    def close(self):
+        self.connection.close()
+
+    # ---------------------------
+    # -------- REQUESTS ---------
+    # ---------------------------
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def load(self, directory=None, contexts=None, features=None, mapping=None, compiled=None, compact=False):
+        """
+        Loads the model of directory (or of the three files, or compiled) and returns its summary, with its key
+        under "model" and "cached" telling whether it was already loaded.
+        """
+        body = {"compact": compact}
+        if compiled is not None:
+            body["compiled"] = compiled
+        elif directory is not None:
+            body["directory"] = directory
+        else:
+            body.update({"contexts": contexts, "features": features, "mapping": mapping})
+        return self.request("POST", "/models", body)
+
+    def models(self):
+        return self.request("GET", "/models")["models"]
+
+    def summary(self, model):
+        return self.request("GET", "/models/" + model)
+
+    def evict(self, model):
+        return self.request("DELETE", "/models/" + model)
+
+    def pairs(self, model, offset=0, limit=None):
+        return self.request("GET", "/models/" + model + "/pairs", offset=offset, limit=limit)["pairs"]
+
+    def mapping(self, model, context=None, feature=None):
+        """
+        Returns the mapping of model (its lines and both directions of the index), or only the features activated by
+        context or the contexts activating feature.
+        """
+        return self.request("GET", "/models/" + model + "/mapping", context=context, feature=feature)
+
+    def mutants(self, model, offset=0, limit=None):
+        return self.request("GET", "/models/" + model + "/mutants", offset=offset, limit=limit)["mutants"]
+
+    def questions(self, model, offset=0, limit=None):
+        return self.request("GET", "/models/" + model + "/questions", offset=offset, limit=limit)["questions"]
+
+    def answer(self, model, index, answer):
+        """
+        Submits the answer to the question index of model and returns whether its mutants survive.
+        """
+        return self.request("POST", "/models/" + model + "/answers", {"index": index, "answer": answer})["survived"]
+
+    def result(self, model):
+        return self.request("GET", "/models/" + model + "/result")
@@ -0,0 +1,418 @@
+# Author: Audric Deckers
+import sys
+from array import array
+from collections.abc import Mapping, Sequence, Set
+from CFMnode import *
+
+# Parent code of the nodes whose parent is the root of the tree while the root itself is not a node.
+ROOT_PARENT = -2
+
+class CFMCompactTree:
+    """
+    Compact storage of the nodes of one model type. Names are interned to integer ids (in order of appearance) and
+    the parent id, constraint code (index in self.constraints) and depth of each node are kept in typed arrays, -1
+    standing for None. Children and the relationships a node is the parent of are kept in lists while the file is
+    read, then packed in CSR offset/index arrays by pack().
+    """
+    def __init__(self, modelType):
+        self.modelType = modelType
+        self.names = []
+        self.ids = {}
+        self.constraints = []   # Constraint code -> constraint, as written in the file.
+        self.parent = array('i')
+        self.constraint = array('b')
+        self.depth = array('i')
+        # Constraint code of the first relationship each node is a child of, -1 for none, and the codes of the
+        # other relationships (rare) in self.otherMemberships.
+        self.membership = array('b')
+        self.otherMemberships = {}
+        # Relationships as (parent id, constraint code, children names).
+        self.relations = []
+        # Unpacked children and relationships of the parents, id -> list of ids, until pack(), and the same children
+        # as sets for the parents with many children (cfr. SIBLINGS_SCANNED).
+        self.pendingChildren = {}
+        self.pendingGroups = {}
+        self.pendingSiblings = {}
+        self.childOffsets = self.childIndexes = self.groupOffsets = self.groupIndexes = None
+
+    # ---------------------------
+    # --------- HELPERS ---------
+    # -------- FUNCTIONS --------
+    # ---------------------------
+
+    def getOrCreate(self, name):
+        id = self.ids.get(name)
+        if id is None:
+            id = len(self.names)
+            name = sys.intern(name)
+            self.names.append(name)
+            self.ids[name] = id
+            self.parent.append(-1)
+            self.constraint.append(-1)
+            self.depth.append(0)
+            self.membership.append(-1)
+        return id
+
+    def code(self, constraint):
+        if constraint not in self.constraints:
+            self.constraints.append(constraint)
+        return self.constraints.index(constraint)
+
+    def constraintName(self, code):
+        return None if code < 0 else self.constraints[code]
+
+    def parentName(self, id):
+        parent = self.parent[id]
+        if parent == ROOT_PARENT:
+            return ROOTS[self.modelType]
+        return None if parent < 0 else self.names[parent]
+
+    def memberships(self, id):
+        """
+        Returns the constraints of the relationships id is listed as a child of.
+        """
+        if self.membership[id] < 0:
+            return []
+        return [self.constraints[code] for code in [self.membership[id]] + self.otherMemberships.get(id, [])]
+
+    def childIds(self, id):
+        if self.childOffsets is None:
+            return self.pendingChildren.get(id, [])
+        return self.childIndexes[self.childOffsets[id]:self.childOffsets[id + 1]]
+
+    def children(self, id):
+        return list(map(self.names.__getitem__, self.childIds(id)))
+
+    def groupIds(self, id):
+        if self.groupOffsets is None:
+            return self.pendingGroups.get(id, [])
+        return self.groupIndexes[self.groupOffsets[id]:self.groupOffsets[id + 1]]
+
+    def groups(self, id):
+        relations, constraints = self.relations, self.constraints
+        return [(constraints[relations[group][1]], relations[group][2]) for group in self.groupIds(id)]
+
+    # ---------------------------
+    # ------ REGISTRATION -------
+    # ---------------------------
+
+    def addRelation(self, parent, constraint, children):
+        """
+        Registers the relationship 'parent/constraint/children', with the same merging rules as CFMRegistry.
+        Returns its (parent id, constraint code, children names) record.
+        """
+        self.unpack()
+        code = self.code(constraint)
+        children = tuple(sys.intern(child) for child in children)
+        parentId = self.getOrCreate(parent)
+        self.pendingGroups.setdefault(parentId, []).append(len(self.relations))
+        if self.constraint[parentId] < 0:
+            self.constraint[parentId] = code
+
+        siblings = self.pendingChildren.setdefault(parentId, [])
+        known = self.pendingSiblings.get(parentId)
+        for child in children:
+            childId = self.getOrCreate(child)
+            if self.membership[childId] < 0:
+                # The constraint of a node is the one of the relationship it belongs to.
+                self.parent[childId] = parentId
+                self.constraint[childId] = code
+                self.membership[childId] = code
+            elif code != self.membership[childId] and code not in self.otherMemberships.get(childId, []):
+                self.otherMemberships.setdefault(childId, []).append(code)
+            if known is not None:
+                if childId not in known:
+                    known.add(childId)
+                    siblings.append(childId)
+            elif childId not in siblings:
+                siblings.append(childId)
+                if len(siblings) > SIBLINGS_SCANNED:
+                    known = self.pendingSiblings[parentId] = set(siblings)
+        record = (parentId, code, children)
+        self.relations.append(record)
+        return record
+
+    def finalize(self):
+        """
+        Sets the parent of the nodes never listed as a child, computes the depth of every node from the root and
+        packs the children and relationships of the parents.
+        """
+        root = ROOTS[self.modelType]
+        rootId = self.ids.get(root, ROOT_PARENT)
+        for id in range(len(self.names)):
+            if self.membership[id] < 0:
+                self.parent[id] = rootId
+        for id in range(len(self.names)):
+            if id == rootId or self.membership[id] < 0:
+                self.setDepth(id, 0 if id == rootId else 1)
+        self.pack()
+
+    def setDepth(self, id, depth):
+        stack = [(id, depth)]
+        visited = set()
+        while stack:
+            current, currentDepth = stack.pop()
+            if current in visited:
+                continue
+            visited.add(current)
+            self.depth[current] = currentDepth
+            for child in self.childIds(current):
+                stack.append((child, currentDepth + 1))
+
+    def pack(self):
+        """
+        Moves the children and relationships of the parents to CSR arrays: the values of id are
+        indexes[offsets[id]:offsets[id + 1]].
+        """
+        if self.childOffsets is not None:
+            return
+        self.childOffsets, self.childIndexes = self.packed(self.pendingChildren)
+        self.groupOffsets, self.groupIndexes = self.packed(self.pendingGroups)
+        self.pendingChildren, self.pendingGroups, self.pendingSiblings = {}, {}, {}
+
+    def packed(self, lists):
+        offsets, indexes = array('i', [0]), array('i')
+        for id in range(len(self.names)):
+            indexes.extend(lists.get(id, ()))
+            offsets.append(len(indexes))
+        return offsets, indexes
+
+    def unpack(self):
+        """
+        Moves the CSR arrays back to lists, so that relationships can be added after finalize().
+        """
+        if self.childOffsets is None:
+            return
+        for id in range(len(self.names)):
+            if self.groupOffsets[id] != self.groupOffsets[id + 1]:
+                self.pendingChildren[id] = list(self.childIds(id))
+                self.pendingGroups[id] = list(self.groupIds(id))
+        self.childOffsets = self.childIndexes = self.groupOffsets = self.groupIndexes = None
+
+    # ---------------------------
+    # ------ SERIALISATION ------
+    # ---------------------------
+
+    def state(self):
+        """
+        Returns the finalized tree as a JSON-serialisable dictionary and a name -> typed array dictionary
+        (cfr. CFMcompiled.py). The children of the relationships are stored as a CSR of ids.
+        """
+        self.pack()
+        relationOffsets, relationChildren = array('i', [0]), array('i')
+        for parentId, code, children in self.relations:
+            relationChildren.extend(self.ids[child] for child in children)
+            relationOffsets.append(len(relationChildren))
+        header = {"names": self.names, "constraints": self.constraints,
+                  "otherMemberships": [[id, codes] for id, codes in self.otherMemberships.items()]}
+        arrays = {"parent": self.parent, "constraint": self.constraint, "depth": self.depth,
+                  "membership": self.membership, "childOffsets": self.childOffsets, "childIndexes": self.childIndexes,
+                  "groupOffsets": self.groupOffsets, "groupIndexes": self.groupIndexes,
+                  "relationParents": array('i', [parentId for parentId, code, children in self.relations]),
+                  "relationConstraints": array('b', [code for parentId, code, children in self.relations]),
+                  "relationOffsets": relationOffsets, "relationChildren": relationChildren}
+        return header, arrays
+
+    @classmethod
+    def fromState(cls, modelType, header, arrays):
+        """
+        Returns the finalized tree of modelType described by the header and arrays of state().
+        """
+        tree = cls(modelType)
+        tree.names = [sys.intern(name) for name in header["names"]]
+        tree.ids = {name: id for id, name in enumerate(tree.names)}
+        tree.constraints = header["constraints"]
+        tree.otherMemberships = {id: codes for id, codes in header["otherMemberships"]}
+        for name in ["parent", "constraint", "depth", "membership", "childOffsets", "childIndexes", "groupOffsets",
+                     "groupIndexes"]:
+            setattr(tree, name, arrays[name])
+        names, offsets, children = tree.names, arrays["relationOffsets"], arrays["relationChildren"]
+        tree.relations = [(parentId, code, tuple([names[child] for child in children[offsets[i]:offsets[i + 1]]]))
+                          for i, (parentId, code) in enumerate(zip(arrays["relationParents"],
+                                                                   arrays["relationConstraints"]))]
+        return tree
+
+class CFMCompactNodes(Mapping):
+    """
+    Name -> CFMNodeView mapping over a compact tree, in order of appearance.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __getitem__(self, name):
+        return CFMNodeView(self.tree, self.tree.ids[name])
+
+    def __contains__(self, name):
+        return name in self.tree.ids
+
+    def __iter__(self):
+        return iter(self.tree.names)
+
+    def __len__(self):
+        return len(self.tree.names)
+
+class CFMCompactMemberships(Mapping):
+    """
+    Name -> constraints of the relationships the node is listed as a child of, for the nodes listed as a child.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __getitem__(self, name):
+        id = self.tree.ids.get(name)
+        if id is None or self.tree.membership[id] < 0:
+            raise KeyError(name)
+        return self.tree.memberships(id)
+
+    def __contains__(self, name):
+        id = self.tree.ids.get(name)
+        return id is not None and self.tree.membership[id] >= 0
+
+    def __iter__(self):
+        tree = self.tree
+        return (name for id, name in enumerate(tree.names) if tree.membership[id] >= 0)
+
+    def __len__(self):
+        return sum(1 for code in self.tree.membership if code >= 0)
+
+class CFMCompactAdjacency(Mapping):
+    """
+    Parent name -> children names, for the nodes that are the parent of a relationship.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __getitem__(self, name):
+        id = self.tree.ids.get(name)
+        if id is None or not self.tree.groupIds(id):
+            raise KeyError(name)
+        return self.tree.children(id)
+
+    def __contains__(self, name):
+        id = self.tree.ids.get(name)
+        return id is not None and len(self.tree.groupIds(id)) > 0
+
+    def __iter__(self):
+        tree = self.tree
+        return (name for id, name in enumerate(tree.names) if len(tree.groupIds(id)))
+
+    def __len__(self):
+        return sum(1 for name in self)
+
+class CFMCompactNames(Set):
+    """
+    Set of the names of the nodes of compact trees.
+    """
+    def __init__(self, trees):
+        self.trees = trees
+
+    def __contains__(self, name):
+        return any(name in tree.ids for tree in self.trees)
+
+    def __iter__(self):
+        seen = set()
+        for tree in self.trees:
+            for name in tree.names:
+                if name not in seen:
+                    seen.add(name)
+                    yield name
+
+    def __len__(self):
+        return sum(1 for name in self)
+
+class CFMCompactViews(Sequence):
+    """
+    List of the CFMNodeView of the nodes of compact trees, tree after tree.
+    """
+    def __init__(self, trees):
+        self.trees = trees
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        for tree in self.trees:
+            if 0 <= index < len(tree.names):
+                return CFMNodeView(tree, index)
+            index -= len(tree.names)
+        raise IndexError(index)
+
+    def __len__(self):
+        return sum(len(tree.names) for tree in self.trees)
+
+class CFMCompactRegistry:
+    """
+    Registry with the interface of CFMRegistry (cfr. CFMregistry.py) backed by one CFMCompactTree per model type:
+    the nodes are CFMNodeView built on access instead of one CFMNode object per node. Relationships keep their
+    (node, constraint, children) form, the children names being interned. The registry can be built from finalized
+    trees (e.g. loaded from a compiled model).
+    """
+    def __init__(self, trees=None):
+        self.trees = trees or {modelType: CFMCompactTree(modelType) for modelType in ROOTS}
+        self.contexts = CFMCompactNodes(self.trees["contexts"])
+        self.features = CFMCompactNodes(self.trees["features"])
+        self.adjacency = {modelType: CFMCompactAdjacency(tree) for modelType, tree in self.trees.items()}
+        self.memberships = {modelType: CFMCompactMemberships(tree) for modelType, tree in self.trees.items()}
+        self.relations = {modelType: [(CFMNodeView(tree, parentId), tree.constraints[code], children)
+                                      for parentId, code, children in tree.relations]
+                          for modelType, tree in self.trees.items()}
+
+    # ---------------------------
+    # --------- HELPERS ---------
+    # -------- FUNCTIONS --------
+    # ---------------------------
+
+    def nodesOf(self, modelType):
+        return self.contexts if modelType == "contexts" else self.features
+
+    def selected(self, modelType):
+        return [self.trees[modelType]] if modelType is not None else list(self.trees.values())
+
+    def names(self, modelType=None):
+        """
+        Returns the set of the names of the nodes of modelType (of both types if None).
+        """
+        return CFMCompactNames(self.selected(modelType))
+
+    def views(self, modelType=None):
+        """
+        Returns the list of the nodes of modelType (of both types if None), contexts first.
+        """
+        return CFMCompactViews(self.selected(modelType))
+
+    def getNode(self, name, modelType):
+        id = self.trees[modelType].ids.get(name)
+        return None if id is None else CFMNodeView(self.trees[modelType], id)
+
+    def getOrCreateNode(self, name, modelType):
+        tree = self.trees[modelType]
+        return CFMNodeView(tree, tree.getOrCreate(name))
+
+    def getChildren(self, name, modelType):
+        tree = self.trees[modelType]
+        id = tree.ids.get(name)
+        return [] if id is None else tree.children(id)
+
+    # ---------------------------
+    # ------ REGISTRATION -------
+    # ---------------------------
+
+    def addRelation(self, parent, constraint, children, modelType):
+        tree = self.trees[modelType]
+        parentId, code, children = tree.addRelation(parent, constraint, children)
+        self.relations[modelType].append((CFMNodeView(tree, parentId), tree.constraints[code], children))
+
+    def finalize(self, modelType):
+        self.trees[modelType].finalize()
+
+    # ---------------------------
+    # --------- LOOKUPS ---------
+    # ---------------------------
+
+    def getRelations(self, name, modelType):
+        tree = self.trees[modelType]
+        id = tree.ids.get(name)
+        if id is None:
+            return []
+        return [(constraint, ()) for constraint in tree.memberships(id)] + tree.groups(id)
@@ -0,0 +1,147 @@
+# Author: Audric Deckers
+import json
+import os
+import sys
+from array import array
+from CFMcache import *
+from CFMcompact import *
+from CFMmapping import *
+from CFMregistry import *
+
+# First bytes of a compiled model, followed by the format version and the length of the header.
+MAGIC = b"CFMC"
+FORMAT_VERSION = 2
+
+# Typed arrays of a CFMCompactTree stored after the header, in this order (cfr. CFMCompactTree.state).
+ARRAYS = ["parent", "constraint", "depth", "membership", "childOffsets", "childIndexes", "groupOffsets",
+          "groupIndexes", "relationParents", "relationConstraints", "relationOffsets", "relationChildren"]
+
+class CFMCompiledError(Exception):
+    pass
+
+class CFMCompiledModel:
+    """
+    Validated CFM model compiled into a single file (cfr. compile.py): the id-interned trees of the contexts and
+    features (cfr. CFMcompact.py) and the lines of the mapping. The file is made of a line 'CFMC <version> <length>',
+    a JSON header of length bytes (names, constraints, mapping and the (offset, typecode, count) of each array) and
+    the raw little-endian typed arrays, so that it is loaded with one read and no parsing nor validation.
+    """
+    def __init__(self, trees, mapping):
+        self.trees = trees
+        self.mapping = mapping
+
+    @classmethod
+    def fromModel(cls, model):
+        """
+        Returns the compiled version of model, a parsed CFMmodel (compact or not).
+        """
+        if model.compact:
+            trees = model.registry.trees
+        else:
+            # The relationships are registered again in compact trees, which yields the same ids and merging.
+            trees = {}
+            for modelType in ROOTS:
+                trees[modelType] = CFMCompactTree(modelType)
+                for node, constraint, children in model.registry.relations[modelType]:
+                    trees[modelType].addRelation(node.name, constraint, children)
+                trees[modelType].finalize()
+        return cls(trees, model.mapping)
+
+    # ---------------------------
+    # --------- WRITING ---------
+    # ---------------------------
+
+    def write(self, filename):
+        """
+        Writes the compiled model to filename, atomically so that a concurrent load never reads a partial file.
+        """
+        header = {"trees": {}, "mapping": self.mapping.lines}
+        chunks = []
+        offset = 0
+        for modelType, tree in self.trees.items():
+            treeHeader, arrays = tree.state()
+            treeHeader["arrays"] = {}
+            for name in ARRAYS:
+                values = arrays[name]
+                if sys.byteorder != "little":
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                chunk = values.tobytes()
+                treeHeader["arrays"][name] = [offset, values.typecode, len(values)]
+                chunks.append(chunk)
+                offset += len(chunk)
+            header["trees"][modelType] = treeHeader
+        encoded = json.dumps(header, separators=(",", ":")).encode()
+
+        f, temporary = temporaryFile(filename, "wb")
+        with f:
+            f.write(MAGIC + b" " + str(FORMAT_VERSION).encode() + b" " + str(len(encoded)).encode() + b"\n")
+            f.write(encoded)
+            f.writelines(chunks)
+        publish(temporary, filename)
+
+    # ---------------------------
+    # --------- LOADING ---------
+    # ---------------------------
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Returns the compiled model stored in filename, raises CFMCompiledError if it is not a compiled model of
+        this version.
+        """
+        with open(filename, "rb") as f:
+            content = f.read()
+        end = content.find(b"\n")
+        fields = content[:end].split(b" ") if end > 0 else []
+        if len(fields) != 3 or fields[0] != MAGIC:
+            raise CFMCompiledError(filename + " is not a compiled CFM model.")
+        if fields[1] != str(FORMAT_VERSION).encode():
+            raise CFMCompiledError(filename + " was compiled with another version (" + fields[1].decode() +
+                                   "), please compile it again.")
+        start = end + 1 + int(fields[2])
+        header = json.loads(content[end + 1:start])
+        data = memoryview(content)[start:]
+
+        trees = {}
+        for modelType, treeHeader in header["trees"].items():
+            arrays = {}
+            for name, (offset, typecode, count) in treeHeader["arrays"].items():
+                values = array(typecode)
+                values.frombytes(data[offset:offset + count * values.itemsize])
+                if sys.byteorder != "little":
+                    values.byteswap()
+                arrays[name] = values
+            trees[modelType] = CFMCompactTree.fromState(modelType, treeHeader, arrays)
+        data.release()
+        return cls(trees, CFMMapping(header["mapping"]))
+
+    def registry(self, compact=False):
+        """
+        Returns the registry of the compiled model: a CFMCompactRegistry over its trees when compact is set,
+        otherwise a CFMRegistry with the CFMNodes and indexes the text files would have produced.
+        """
+        if compact:
+            return CFMCompactRegistry(self.trees)
+        registry = CFMRegistry()
+        for modelType, tree in self.trees.items():
+            nodes = registry.nodesOf(modelType)
+            adjacency, memberships = registry.adjacency[modelType], registry.memberships[modelType]
+            names, ids, constraints = tree.names, tree.ids, tree.constraints
+            # Constraint code -1 (no constraint) is the last item of constraintNames.
+            type, constraintNames = modelType[:-1], constraints + [None]
+            for id, name in enumerate(names):
+                nodes[name] = CFMNode(name, type, tree.parentName(id), constraintNames[tree.constraint[id]],
+                                      None, tree.depth[id])
+            for parentId, code, children in tree.relations:
+                parent, constraint = nodes[names[parentId]], constraints[code]
+                if parent.name not in adjacency:
+                    adjacency[parent.name] = parent.children = tree.children(parentId)
+                parent.groups.append((constraint, children))
+                for child in children:
+                    if child not in memberships:
+                        id = ids[child]
+                        memberships[child] = [constraints[tree.membership[id]]] + \
+                                             [constraints[other] for other in tree.otherMemberships.get(id, ())]
+                registry.relations[modelType].append((parent, constraint, children))
+        return registry
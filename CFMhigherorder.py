@@ -0,0 +1,115 @@
+# Author: Audric Deckers
+import random
+from itertools import islice
+from math import comb
+
+# Consecutive rejected draws after which the sampling stops (the space left is too small or too constrained).
+SAMPLE_ATTEMPTS = 1000
+
+class CFMHigherOrder:
+    """
+    Higher-order mutants of a CFM model: combinations of order first-order mutants (cfr. CFMmodel.streamMutants)
+    applying distinct changes to distinct nodes. The first-order mutants are kept once per signature, and the
+    combinations are streamed, either exhaustively in lexicographic order or by seeded random sampling, so that only
+    the current combination (and, when sampling, the ones already drawn) is held in memory.
+    """
+    def __init__(self, model, order=2):
+        if order < 2:
+            raise ValueError("The order of higher-order mutants must be at least 2.")
+        self.model = model
+        self.order = order
+
+        # First-order (mutant, question) items, one per signature, and the (model type, node) couples each changes.
+        self.items = []
+        self.nodes = []
+        signatures = set()
+        for mutant, question in model.iterMutants():
+            if question['signature'] in signatures:
+                continue
+            signatures.add(question['signature'])
+            self.items.append((mutant, question))
+            self.nodes.append(frozenset((change[0], change[1]) for change in question['signature']))
+
+    def upperBound(self):
+        """
+        Returns the number of combinations before the ones touching the same node are pruned.
+        """
+        return comb(len(self.items), self.order)
+
+    def compatible(self, indexes):
+        touched = set()
+        for i in indexes:
+            if not touched.isdisjoint(self.nodes[i]):
+                return False
+            touched |= self.nodes[i]
+        return True
+
+    # ---------------------------
+    # ------ COMBINATIONS -------
+    # ---------------------------
+
+    def iterCombinations(self):
+        """
+        Yields the combinations (as sorted tuples of indexes in self.items) of changes to distinct nodes, in
+        lexicographic order. A prefix touching a node twice is pruned with all its extensions.
+        """
+        n, k, nodes = len(self.items), self.order, self.nodes
+        indexes = []
+        touched = set()
+        start = 0
+        while True:
+            if len(indexes) == k:
+                yield tuple(indexes)
+                i = None
+            else:
+                # Next index compatible with the prefix, leaving room for the remaining ones.
+                last = n - (k - len(indexes))
+                i = start
+                while i <= last and not touched.isdisjoint(nodes[i]):
+                    i += 1
+                if i > last:
+                    i = None
+            if i is None:
+                if not indexes:
+                    return
+                previous = indexes.pop()
+                touched -= nodes[previous]
+                start = previous + 1
+            else:
+                indexes.append(i)
+                touched |= nodes[i]
+                start = i + 1
+
+    def iterSamples(self, budget, seed=None):
+        """
+        Yields up to budget distinct combinations of changes to distinct nodes drawn at random with seed.
+        """
+        rnd = random.Random(seed)
+        n, k = len(self.items), self.order
+        if n < k:
+            return
+        drawn = set()
+        attempts = 0
+        while len(drawn) < budget and attempts < SAMPLE_ATTEMPTS:
+            indexes = tuple(sorted(rnd.sample(range(n), k)))
+            attempts += 1
+            if indexes in drawn or not self.compatible(indexes):
+                continue
+            drawn.add(indexes)
+            attempts = 0
+            yield indexes
+
+    def iterMutants(self, budget=None, seed=None):
+        """
+        Yields the higher-order mutants as tuples of order first-order (mutant, question) items: at most budget of
+        them (all if None), drawn at random with seed if it is given (which requires a budget), otherwise in
+        lexicographic order.
+        """
+        if seed is not None:
+            if budget is None:
+                raise ValueError("Sampling higher-order mutants requires a budget.")
+            combinations = self.iterSamples(budget, seed)
+        else:
+            combinations = islice(self.iterCombinations(), budget)
+        for indexes in combinations:
+            yield tuple(self.items[i] for i in indexes)
@@ -0,0 +1,198 @@
+# Author: Audric Deckers
+from collections import Counter
+from CFMmodel import *
+
+class CFMIncremental:
+    """
+    Incremental re-analysis of a CFM model. The connected pairs found from each context relationship and the mutants
+    of each connected pair are indexed, so that when a file of the model is edited only the relationships whose
+    children, mapping or related features changed are recomputed. The resulting model is identical to a full rebuild.
+    """
+    def __init__(self, model):
+        if model.compiled is not None:
+            raise ValueError("A compiled model (" + model.compiled + ") cannot be re-analysed incrementally, please "
+                             "build it from its contexts, features and mapping files.")
+        if model.connectedPairs is None:
+            model.generateConnectedPairs()
+            model.generateMutants()
+        self.model = model
+
+        # Relationship key -> connected pairs found from this context relationship, in order and without duplicates.
+        self.relationPairs = {}
+        # Connected pair -> ((mutant, question) items, mutations.txt lines, count of mutations.txt).
+        self.pairMutants = {}
+
+        # Mapping index: context -> set of features it activates, and the contexts and features of the mapping.
+        self.rows, self.mappedContexts, self.mappedFeatures = self.activationRows(model)
+
+        for key, relation in self.keyedRelations(model):
+            self.relationPairs[key] = self.relationConnectedPairs(model, relation)
+        for connectedPair in model.connectedPairs:
+            self.mutate(model, connectedPair)
+
+    # ---------------------------
+    # --------- HELPERS ---------
+    # -------- FUNCTIONS --------
+    # ---------------------------
+
+    def activationRows(self, model):
+        """
+        Returns, for each context, the set of features it is connected to by the mapping (cfr. CFMmapping.py), with
+        the contexts and features of the mapping.
+        """
+        mapping = model.mapping
+        return mapping.features, set(mapping.features), set(mapping.contexts)
+
+    def keyedRelations(self, model):
+        """
+        Returns the context relationships of model with a key identifying them across versions of the file.
+        """
+        occurrences = {}
+        keyed = []
+        for relation in model.registry.relations["contexts"]:
+            line = (relation[0].name, relation[1], relation[2])
+            occurrences[line] = occurrences.get(line, 0) + 1
+            keyed.append((line + (occurrences[line],), relation))
+        return keyed
+
+    def relationLines(self, model, modelType):
+        return [(node.name, constraint, children) for node, constraint, children in model.registry.relations[modelType]]
+
+    def changedNames(self, previous, model, modelType):
+        """
+        Returns the parents and children of the relationships added to or removed from the modelType file.
+        """
+        before = Counter(self.relationLines(previous, modelType))
+        after = Counter(self.relationLines(model, modelType))
+        names = set()
+        for parent, constraint, children in (before - after) + (after - before):
+            names.add(parent)
+            names.update(children)
+        return names
+
+    def relationConnectedPairs(self, model, relation):
+        pairs = {}
+        for connectedPair in model.iterConnectedPairsPython([relation]):
+            pairs[connectedPair] = None
+        return list(pairs)
+
+    def mutate(self, model, connectedPair):
+        """
+        Indexes the mutants of connectedPair, with the lines and count they add to mutations.txt.
+        """
+        lines = []
+        items = list(model.streamMutants([connectedPair], lines.append))
+        # The last line is the total of this single connected pair.
+        count = int(lines.pop().split(": ")[1])
+        self.pairMutants[connectedPair] = (items, lines, count)
+
+    # ---------------------------
+    # ------ INCREMENTAL --------
+    # ------- RE-ANALYSIS -------
+    # ---------------------------
+
+    def affectedContexts(self, previous, model, rows, mappedContexts, mappedFeatures):
+        """
+        Returns the contexts whose connected pairs may have changed: the ones whose mapping changed, the ones defined
+        in changed lines of contexts.txt, and the ones connected to features defined in changed lines of features.txt
+        or whose parent mapping changed.
+        """
+        affected = {context for context in set(rows) | set(self.rows) if rows.get(context) != self.rows.get(context)}
+        affected |= mappedContexts ^ self.mappedContexts
+        affected |= self.changedNames(previous, model, "contexts")
+
+        features = self.changedNames(previous, model, "features")
+        for changed in mappedFeatures ^ self.mappedFeatures:
+            for registry in [previous.registry, model.registry]:
+                for constraint, children in registry.getRelations(changed, "features"):
+                    features.update(children)
+        if features:
+            for table in [self.rows, rows]:
+                for context, activated in table.items():
+                    if not activated.isdisjoint(features):
+                        affected.add(context)
+        return affected
+
+    def update(self, contextsFile=None, featuresFile=None, mappingFile=None):
+        """
+        Re-analyses the model after some of its files changed (None keeps the previous file) and returns the
+        differences of mutants and questions with the previous model. The new model is stored in self.model.
+        """
+        previous = self.model
+        files = [new if new is not None else old for new, old in zip([contextsFile, featuresFile, mappingFile], previous.files)]
+        # Built with the settings of the previous model, its operators in particular, so that the new connected pairs
+        # are mutated like the ones kept.
+        model = CFMmodel(*files, engine=previous.engine, lazy=True, mutationsFile=previous.mutationsFile,
+                         workers=previous.workers, compact=previous.compact, operators=previous.operators,
+                         report=previous.report, reportThread=previous.reportThread)
+
+        rows, mappedContexts, mappedFeatures = self.activationRows(model)
+        affected = self.affectedContexts(previous, model, rows, mappedContexts, mappedFeatures)
+
+        # Recompute the connected pairs of the new and affected relationships only.
+        relationPairs = {}
+        recomputed = 0
+        for key, relation in self.keyedRelations(model):
+            node, constraint, children = relation
+            if key in self.relationPairs and node.name not in affected and affected.isdisjoint(children):
+                relationPairs[key] = self.relationPairs[key]
+            else:
+                relationPairs[key] = self.relationConnectedPairs(model, relation)
+                recomputed += 1
+
+        # Assemble the connected pairs in the order of a full rebuild.
+        connectedPairs = {}
+        for pairs in relationPairs.values():
+            for connectedPair in pairs:
+                connectedPairs[connectedPair] = None
+        model.connectedPairs = list(connectedPairs)
+
+        # Mutate the new connected pairs only and drop the ones that disappeared.
+        for connectedPair in model.connectedPairs:
+            if connectedPair not in self.pairMutants:
+                self.mutate(model, connectedPair)
+        for connectedPair in list(self.pairMutants):
+            if connectedPair not in connectedPairs:
+                del self.pairMutants[connectedPair]
+
+        model.mutants, model.questions, model.mutationsLog = [], [], []
+        count = 0
+        for connectedPair in model.connectedPairs:
+            items, lines, pairCount = self.pairMutants[connectedPair]
+            for mutant, question in items:
+                model.mutants.append(mutant)
+                model.questions.append(question)
+            model.mutationsLog.extend(lines)
+            count += pairCount
+        model.mutationsLog.append("Total mutant generated: "+str(count)+"\n")
+        model.writeMutationsLog()
+
+        diff = self.diff(previous, model)
+        diff['recomputedRelations'] = recomputed
+        diff['reusedRelations'] = len(relationPairs) - recomputed
+
+        self.model = model
+        self.relationPairs = relationPairs
+        self.rows, self.mappedContexts, self.mappedFeatures = rows, mappedContexts, mappedFeatures
+        return diff
+
+    def diff(self, previous, model):
+        """
+        Returns the mutants and questions added and removed between previous and model.
+        """
+        def keyed(m):
+            items = {}
+            for mutant, question in zip(m.mutants, m.questions):
+                items.setdefault((mutant, question['question'], question['mutation']), []).append((mutant, question))
+            return items
+
+        before, after = keyed(previous), keyed(model)
+        added, removed = [], []
+        for key in after:
+            added.extend(after[key][len(before.get(key, [])):])
+        for key in before:
+            removed.extend(before[key][len(after.get(key, [])):])
+        return {'addedMutants': [mutant for mutant, question in added],
+                'removedMutants': [mutant for mutant, question in removed],
+                'addedQuestions': [question for mutant, question in added],
+                'removedQuestions': [question for mutant, question in removed]}
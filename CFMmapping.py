@@ -0,0 +1,82 @@
+# Author: Audric Deckers
+
+class CFMMapping:
+    """
+    Bidirectional index of the ACTIVATES mapping, built once while the mapping file is read. Every line is kept as a
+    (contexts, features) couple of name tuples, and merged into context -> set of the features it activates and
+    feature -> set of the contexts activating it: a name appearing on several lines keeps the union of its lines.
+    """
+    def __init__(self, lines=()):
+        self.lines = []
+        self.features = {}
+        self.contexts = {}
+        # Children tuple -> set of the features activated by any of them (cfr. activatedBy).
+        self.reached = {}
+        for contexts, features in lines:
+            self.add(contexts, features)
+
+    def add(self, contexts, features):
+        """
+        Adds the line 'contexts-ACTIVATES-features' (lists of names) to the index.
+        """
+        contexts, features = tuple(contexts), tuple(features)
+        self.lines.append((contexts, features))
+        for context in contexts:
+            self.features.setdefault(context, set()).update(features)
+        for feature in features:
+            self.contexts.setdefault(feature, set()).update(contexts)
+        self.reached = {}
+
+    # ---------------------------
+    # --------- LOOKUPS ---------
+    # ---------------------------
+
+    def isMapped(self, name, modelType):
+        """
+        Returns whether name, a node of modelType = {contexts / features}, appears in the mapping.
+        """
+        return name in (self.features if modelType == "contexts" else self.contexts)
+
+    def featuresOf(self, context):
+        return self.features.get(context, frozenset())
+
+    def contextsOf(self, feature):
+        return self.contexts.get(feature, frozenset())
+
+    def activates(self, context, feature):
+        return feature in self.features.get(context, ())
+
+    def activatedBy(self, contexts):
+        """
+        Returns the set of the features activated by any of contexts (a children tuple), computed once per tuple.
+        """
+        reached = self.reached.get(contexts)
+        if reached is None:
+            reached = set()
+            for context in contexts:
+                reached.update(self.features.get(context, ()))
+            self.reached[contexts] = reached
+        return reached
+
+    def connects(self, contexts, features):
+        """
+        Returns whether any of contexts activates any of features, e.g. the children of a context relationship and
+        of a feature relationship, in time bounded by the number of features once activatedBy(contexts) is known.
+        """
+        return not self.activatedBy(contexts).isdisjoint(features)
+
+    def pairs(self):
+        """
+        Yields the (context, feature) couples of the mapping, each once.
+        """
+        for context, features in self.features.items():
+            for feature in features:
+                yield context, feature
+
+    def asDict(self):
+        """
+        Returns the mapping as a JSON-serialisable dictionary, for other tools.
+        """
+        return {"lines": [[list(contexts), list(features)] for contexts, features in self.lines],
+                "features": {context: sorted(features) for context, features in self.features.items()},
+                "contexts": {feature: sorted(contexts) for feature, contexts in self.contexts.items()}}
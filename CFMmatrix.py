@@ -0,0 +1,168 @@
+# Author: Audric Deckers
+import sys
+from CFMpair import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Maximum number of boolean cells materialised at once when reducing the activation matrix.
+BLOCK_SIZE = 1 << 24
+
+class CFMMatrixEngine:
+    """
+    Vectorized connected pair discovery. Contexts and features taking part in the mapping get integer ids,
+    the ACTIVATES mapping is stored as a boolean context x feature matrix and the connectivity of each
+    relationship is computed by reducing this matrix over the children of the relationship.
+    """
+    def __init__(self, registry, mapping):
+        if np is None:
+            print("Please, install numpy to use the numpy engine.\n")
+            sys.exit()
+
+        self.registry = registry
+        self.mapping = mapping
+
+        # Integer ids of the contexts and features that can be connected (cfr. generateConnectedPairs).
+        self.contextNames = [name for name in registry.contexts if name in mapping.features]
+        self.featureNames = [name for name in registry.features if name in mapping.contexts]
+        self.contextIds = {name: i for i, name in enumerate(self.contextNames)}
+        self.featureIds = {name: i for i, name in enumerate(self.featureNames)}
+
+        self.activations = self.activationMatrix()
+
+    # ---------------------------
+    # --------- HELPERS ---------
+    # -------- FUNCTIONS --------
+    # ---------------------------
+
+    def activationMatrix(self):
+        """
+        Returns the boolean matrix A where A[c, f] is True when the mapping connects context c and feature f.
+        """
+        activations = np.zeros((len(self.contextNames), len(self.featureNames)), dtype=bool)
+        contextIds, featureIds = self.contextIds, self.featureIds
+        for context, feature in self.mapping.pairs():
+            if context in contextIds and feature in featureIds:
+                activations[contextIds[context], featureIds[feature]] = True
+        return activations
+
+    def membership(self, relations, ids):
+        """
+        Returns the indexes of the relationships having at least one child with an id, together with
+        the CSR offsets and flat child ids of these relationships.
+        """
+        indexes, offsets, flat = [], [], []
+        for i, (node, constraint, children) in enumerate(relations):
+            childIds = [ids[child] for child in children if child in ids]
+            if childIds:
+                indexes.append(i)
+                offsets.append(len(flat))
+                flat.extend(childIds)
+        return indexes, np.array(offsets, dtype=np.intp), np.array(flat, dtype=np.intp)
+
+    def childMask(self, relations, indexes, offsets, flat, size, keep):
+        """
+        Returns the boolean mask of the children of the relationships for which keep(node, constraint) holds.
+        """
+        mask = np.zeros(size, dtype=bool)
+        ends = list(offsets[1:]) + [len(flat)]
+        for i, start, end in zip(indexes, offsets, ends):
+            node, constraint, children = relations[i]
+            if keep(node, constraint):
+                mask[flat[start:end]] = True
+        return mask
+
+    def reduceRows(self, matrix, offsets, flat):
+        """
+        ORs the rows of matrix over each relationship (flat[offsets[i]:offsets[i+1]]), block by block.
+        """
+        result = np.zeros((len(offsets), matrix.shape[1]), dtype=bool)
+        if len(offsets) == 0 or matrix.shape[1] == 0:
+            return result
+        ends = np.append(offsets[1:], len(flat))
+        step = max(1, BLOCK_SIZE // max(1, matrix.shape[1]))
+        start = 0
+        while start < len(offsets):
+            stop = start
+            # Take as many relationships as the block allows (at least one).
+            while stop < len(offsets) and (stop == start or ends[stop] - offsets[start] <= step):
+                stop += 1
+            block = matrix[flat[offsets[start]:ends[stop - 1]]]
+            result[start:stop] = np.logical_or.reduceat(block, offsets[start:stop] - offsets[start], axis=0)
+            start = stop
+        return result
+
+    # ---------------------------
+    # ----- CONNECTED PAIRS -----
+    # ---------------------------
+
+    def iterConnectedPairs(self):
+        """
+        Yields the connected pairs selected by the same rules as CFMmodel.iterConnectedPairsPython, duplicates included,
+        ordered by context relationship, feature relationship and children.
+        """
+        registry = self.registry
+        relationsContext = registry.relations["contexts"]
+        relationsFeature = registry.relations["features"]
+        dictContexts, dictFeatures = self.mapping.features, self.mapping.contexts
+
+        rowsContext, offsetsContext, flatContext = self.membership(relationsContext, self.contextIds)
+        rowsFeature, offsetsFeature, flatFeature = self.membership(relationsFeature, self.featureIds)
+        if not rowsContext or not rowsFeature:
+            return
+
+        # reached[r, f]: a child of the context relationship r activates feature f.
+        reached = self.reduceRows(self.activations, offsetsContext, flatContext)
+        featureChildren = self.childMask(relationsFeature, rowsFeature, offsetsFeature, flatFeature, len(self.featureNames),
+                                         lambda node, constraint: True)
+
+        # Children of a parent context which is not Alternative nor Or are connected to every feature child they activate.
+        contextChildren = self.childMask(relationsContext, rowsContext, offsetsContext, flatContext, len(self.contextNames),
+                                         lambda node, constraint: constraint not in ["Alternative", "Or"])
+        pairsChildren = np.argwhere(self.activations & contextChildren[:, None] & featureChildren[None, :])
+
+        # Features under a mapped parent, and under the feature root when it is neither Alternative nor Or.
+        mappedParent = self.childMask(relationsFeature, rowsFeature, offsetsFeature, flatFeature, len(self.featureNames),
+                                      lambda node, constraint: node.name in dictFeatures)
+        rootParent = self.childMask(relationsFeature, rowsFeature, offsetsFeature, flatFeature, len(self.featureNames),
+                                    lambda node, constraint: node.name == "Feature" and constraint not in ["Alternative", "Or"])
+
+        # connected[r, s]: a child of the context relationship r activates a child of the feature relationship s,
+        # computed for the feature relationships whose parent is neither mapped nor the root.
+        plainFeature = [relation for relation in relationsFeature
+                        if relation[0].name not in dictFeatures and relation[0].name != "Feature"]
+        rowsPlain, offsetsPlain, flatPlain = self.membership(plainFeature, self.featureIds)
+        connected = self.reduceRows(np.ascontiguousarray(reached.T), offsetsPlain, flatPlain).T
+
+        for k, i in enumerate(rowsContext):
+            context, constraintContext, childrenContext = relationsContext[i]
+            unmapped = context.name not in dictContexts
+
+            if unmapped and context.name != "Context":
+                for j in np.flatnonzero(connected[k]):
+                    feature, constraintFeature, childrenFeature = plainFeature[rowsPlain[j]]
+                    pair = ConnectedPair(context.name, constraintContext, childrenContext,
+                                         feature.name, constraintFeature, childrenFeature)
+                    yield pair
+
+            selected = np.zeros(len(self.featureNames), dtype=bool)
+            if unmapped:
+                selected |= mappedParent
+            if constraintContext in ["Alternative", "Or"]:
+                selected |= rootParent
+            for f in np.flatnonzero(reached[k] & selected):
+                childFeature = self.featureNames[f]
+                for relationFeature in registry.getRelations(childFeature, "features"):
+                    pair = ConnectedPair(context.name, constraintContext, childrenContext,
+                                         childFeature, relationFeature[0], relationFeature[1])
+                    yield pair
+
+        for c, f in pairsChildren:
+            childContext, childFeature = self.contextNames[c], self.featureNames[f]
+            for relationContext in registry.getRelations(childContext, "contexts"):
+                for relationFeature in registry.getRelations(childFeature, "features"):
+                    pair = ConnectedPair(childContext, relationContext[0], relationContext[1],
+                                         childFeature, relationFeature[0], relationFeature[1])
+                    yield pair
@@ -1,10 +1,39 @@
 # Author: Audric Deckers
+import os
 import sys
 from time import sleep
 from CFMnode import *
+from CFMoperators import *
+from CFMregistry import *
+from CFMcompact import *
+from CFMcompiled import *
+from CFMvalidator import *
+from CFMpair import *
+from CFMmapping import *
+from CFMmatrix import *
+from CFMstats import *
+from CFMreport import *
+from CFMcache import *
+from CFMparallel import *
+from CFMoracle import *
+from CFManswers import *
+from CFMsemantics import *
+from CFMhigherorder import *
+from CFMoverlay import *
+
+# Engines available to generate the connected pairs.
+ENGINES = ["python", "numpy", "parallel"]
+
+# Default file where the processed connected pairs and applied mutations are logged.
+MUTATIONS_FILE = "models/mutants/mutations.txt"
+
+# Files of a model directory, in the order of the arguments of CFMmodel.
+MODEL_FILES = ["contexts.txt", "features.txt", "mapping.txt"]
 
 class CFMmodel:
-    def __init__(self, contextsFile=None, featuresFile=None, mappingFile=None):
+    def __init__(self, contextsFile=None, featuresFile=None, mappingFile=None, engine="python", profile=False, lazy=False,
+                 cache=None, mutationsFile=MUTATIONS_FILE, workers=None, compact=False, compiled=None,
+                 operators=None, report="text", reportThread=False):
         path = 'models/examples/runningexample/'
         if featuresFile is None:
             featuresFile = path+'features.txt'
@@ -12,40 +41,125 @@ class CFMmodel:
             contextsFile = path+'contexts.txt'
         if mappingFile is None:
             mappingFile = path+'mapping.txt'
+        self.files = (contextsFile, featuresFile, mappingFile)
+        # Compiled model (cfr. compile.py) loaded instead of the text files, which are then neither parsed nor checked
+        self.compiled = compiled
+        if compiled is not None:
+            self.files = (compiled,) * 3
+
+        # File where the mutations are logged, None to disable the log, in the report sink (text, ndjson or csv),
+        # written by a background thread when reportThread is set (cfr. CFMreport.py)
+        self.mutationsFile = mutationsFile
+        if report not in SINKS:
+            print("Please, choose a report sink among: " + ", ".join(SINKS) + ".\n")
+            sys.exit()
+        self.report = report
+        self.reportThread = reportThread
+
+        # Engine used to generate the connected pairs, either "python", "numpy" (cfr. CFMmatrix.py) or "parallel",
+        # which shards the "python" engine over workers processes (cfr. CFMparallel.py)
+        if engine not in ENGINES:
+            print("Please, choose an engine among: " + ", ".join(ENGINES) + ".\n")
+            sys.exit()
+        self.engine = engine
+        self.workers = workers
+
+        # Validator of the text files, whose warnings (duplicate children, orphan parents) are kept once the model is
+        # built, None when the model is loaded from a compiled file or from the cache (cfr. CFMvalidator.py)
+        self.validator = None
+
+        # Mutation operators applied to the connected pairs, the default ones if None (cfr. CFMoperators.py)
+        self.operators = operators if operators is not None else DEFAULT_REGISTRY
+
+        # Instrumentation of each phase, with the tracemalloc peaks when profile is set (cfr. CFMstats.py)
+        self.stats = CFMStats(memory=profile)
+
+        # Array-backed representation of the model (cfr. below), part of the cache key and kept on a cache hit
+        self.compact = compact
+
+        # Feature child -> indexes of the feature relationships listing it, built on first use and not cached
+        # (cfr. featureRelationIndex)
+        self.featureRelations = None
+
+        # On-disk cache of parsed models and generated mutants, if any (cfr. CFMcache.py)
+        self.cache = cache
+        if cache is not None:
+            self.cacheKey = cache.key(list(dict.fromkeys(self.files)),
+                                      ("compact" if compact else "") + self.operators.variant())
+            state = cache.load(self.cacheKey)
+            self.stats.cache = "miss" if state is None else "hit"
+            if state is not None:
+                self.restore(state)
+                self.stats.stop()
+                return
+
+        # Registry indexing the CFMnodes by name (cfr. CFMregistry.py), or its array-backed version for very large
+        # models when compact is set (cfr. CFMcompact.py), whose sets and lists below are views over the registry
+        if compiled is not None:
+            with self.stats.phase("loadCompiled"):
+                model = CFMCompiledModel.load(compiled)
+                self.registry = model.registry(compact)
+        else:
+            self.registry = CFMCompactRegistry() if compact else CFMRegistry()
 
         # Set to keep track of each nodes (contexts + features)
-        self.nodes = set()
+        self.nodes = self.registry.names() if compact else set()
 
         # List containing CFMnodes information (cfr. CFMnode.py)
-        self.cfmnodes = []
+        self.cfmnodes = self.registry.views() if compact else []
         # List of CFMnodes that are exclusively features.
-        self.cfmfeatures = []
+        self.cfmfeatures = self.registry.views("features") if compact else []
         # List of CFMnodes that are exclusively contexts.
-        self.cfmcontexts = []
+        self.cfmcontexts = self.registry.views("contexts") if compact else []
 
         # Initialise set of contexts
-        self.contexts = set()
-        self.processCFFiles(contextsFile, "contexts")
-
+        self.contexts = self.registry.names("contexts") if compact else set()
         # Initialise set of features
-        self.features = set()
-        self.processCFFiles(featuresFile, "features")
-
-        # Initialise mapping dictionnaries
-        self.dictContext = {}
-        self.dictFeature = {}
-        self.processMappingFile(mappingFile)
-
-        # Initialise connected pairs in the CFM
-        self.connectedPairs = []
-        self.generateConnectedPairs()
-
-        # Initialise questions List
-        self.questions = []
-
-        # Initialise mutations
-        self.mutants = []
-        self.generateMutants()
+        self.features = self.registry.names("features") if compact else set()
+
+        if compiled is not None:
+            if not compact:
+                for modelType, names, cfmnodes in [("contexts", self.contexts, self.cfmcontexts),
+                                                   ("features", self.features, self.cfmfeatures)]:
+                    nodes = self.registry.nodesOf(modelType)
+                    names.update(nodes)
+                    self.nodes.update(nodes)
+                    cfmnodes.extend(nodes.values())
+                    self.cfmnodes.extend(nodes.values())
+            self.mapping = model.mapping
+        else:
+            # The files are validated while they are parsed, every error being raised at once after the mapping
+            self.validator = CFMValidator()
+            with self.stats.phase("processCFFiles"):
+                self.processCFFiles(contextsFile, "contexts")
+            with self.stats.phase("processCFFiles"):
+                self.processCFFiles(featuresFile, "features")
+
+            # Initialise the mapping index (cfr. CFMmapping.py)
+            self.mapping = CFMMapping()
+            with self.stats.phase("processMappingFile"):
+                self.processMappingFile(mappingFile)
+            self.validator.check()
+
+        # Connected pairs, questions and mutations, left to None until generated. When lazy is set, they are
+        # only generated on demand (cfr. iterConnectedPairs, iterMutants and iterQuestions).
+        self.connectedPairs = None
+        self.questions = None
+        self.mutants = None
+        self.mutationsLog = None
+
+        if not lazy:
+            # Initialise connected pairs in the CFM
+            with self.stats.phase("generateConnectedPairs"):
+                self.generateConnectedPairs()
+
+            # Initialise mutations and questions List
+            with self.stats.phase("generateMutants"):
+                self.generateMutants()
+
+            if cache is not None:
+                cache.store(self.cacheKey, self.snapshot())
+        self.stats.stop()
 
 
     # ---------------------------
@@ -73,50 +187,63 @@ class CFMmodel:
             self.cfmfeatures.append(toBeAdded)
         self.cfmnodes.append(toBeAdded)
 
-    def checkMappingDefinitions(self, dictionnary, type):
+    def addRelation(self, parent, constraint, children, modelType):
         """
-        Checks whether all elements in dictionnary are in the ${type}s.txt file.
+        Registers the relationship in the registry and adds the CFMnodes it creates
+        to the cfmmodelType list and in the cfmnodes list (views of the registry when compact is set).
         """
-        for elems in dictionnary:
-            for elem in elems.split('-'):
-                if elem not in self.nodes:
-                    print("FORMAT ERROR: The "+type+" '"+elem +
-                          "' in mapping.txt does not seem to be defined in "+type+"s.txt")
-                    sys.exit()
-
-    def flattenDict(self, d):
+        if self.compact:
+            self.registry.addRelation(parent, constraint, children, modelType)
+            return
+        nodes = self.registry.nodesOf(modelType)
+        for name in [parent] + children:
+            self.addToSet(name, modelType)
+            if name not in nodes:
+                self.addNode(self.registry.getOrCreateNode(name, modelType), modelType)
+        self.registry.addRelation(parent, constraint, children, modelType)
+
+    def snapshot(self):
         """
-        Flattens a nested dictionary by splitting keys containing hyphens and merging values.
+        Returns the attributes of the model stored in the cache.
         """
-        result = {}
-        for key, values in d.items():
-            for value in values:
-                for sub_key in key.split("-"):
-                    if sub_key not in result:
-                        result[sub_key] = []
-                    result[sub_key].append(value)
-        return result
+        return {name: getattr(self, name) for name in CACHED_ATTRIBUTES}
 
-    def modifyConstraint(self, consContext, consFeature, connectedPair):
+    def restore(self, state):
         """
-        Creates a mutant from a subModel by modifying constraintContext to consContext 
-        and constraintFeature to consFeature.
+        Restores the attributes of the model from the cache, and its mutations.txt file.
         """
-        mutant = connectedPair.copy()
-        mutant['constraintContext'] = consContext
-        mutant['constraintFeature'] = consFeature
-        return mutant
+        self.__dict__.update(state)
+        if self.mutationsLog is not None:
+            self.writeMutationsLog()
+
+    def openReport(self):
+        return CFMReport(self.mutationsFile, self.report, self.reportThread)
 
-    def evalSet(self, dictionnary):
-        return list(map(lambda dict: eval(dict), dictionnary))
+    def writeMutationsLog(self):
+        """
+        Writes the report of the mutations: the text log, or the records generated again from the connected pairs.
+        """
+        with self.openReport() as report:
+            if report.record is None:
+                report.lines(self.mutationsLog)
+            else:
+                for item in self.streamMutants(self.connectedPairs, counted=False, record=report.record):
+                    pass
+
+    def compile(self, filename):
+        """
+        Writes the parsed and validated model to filename, loaded by CFMmodel(compiled=filename) without parsing the
+        text files again (cfr. CFMcompiled.py).
+        """
+        CFMCompiledModel.fromModel(self).write(filename)
 
-    def set_node_depth(self, node, depth, cfmnodes):
-        node.depth = depth
-        for child_name in node.children:
-            child_node = next(
-                (n for n in cfmnodes if n.name == child_name), None)
-            if child_node:
-                self.set_node_depth(child_node, depth + 1, cfmnodes)
+    def connectedPair(self, parentContext, relationContext, parentFeature, relationFeature):
+        """
+        Returns the connected pair between the (constraint, children) relationships of
+        parentContext and parentFeature.
+        """
+        return ConnectedPair(parentContext, relationContext[0], relationContext[1],
+                             parentFeature, relationFeature[0], relationFeature[1])
 
     # ---------------------------
     # --------- STEP 1 ----------
@@ -125,65 +252,24 @@ class CFMmodel:
 
     def processCFFiles(self, filename, type):
         """
-        Reads the content of the file of type = {contexts / features} and returns a list of, 
-        dictionaries where each dictionary contains the values of the three columns in the
-        file splitted into 'parent{type}', 'constraint{type}', 'childrens{type}', and 
-        'mutable{type}' keys.
+        Reads the relationships 'parent/constraint/children' of the file of type = {contexts / features} and adds
+        them to the registry. The lines are checked by the validator, the invalid ones being recorded and skipped.
         """
         modelType = "contexts" if type == "contexts" else "features"
-
-        if filename is None:
-            print("Please, provide a valid " + modelType + ".txt file.\n")
-            sys.exit()
-
-        else:
-            with open(filename) as f:
-                for line in f:
-                    # row[0] = parent, row[1] = constraint, row[2] = children
-                    row = line.strip().split('/')
-                    if row:
-                        # Handle wrong format case
-                        if row[1].lower() not in ["mandatory", "optional", "or", "alternative"]:
-                            print("FORMAT ERROR: In your "+modelType+".txt file, line: " + line + "does not seem to define a valid relationship.")
-                            sys.exit()
-                        else:
-                            # Add parent to the set
-                            self.addToSet(row[0], modelType)
-                            type = "Context" if modelType == "contexts" else "Feature"
-                            self.addNode(CFMNode(name=row[0], parent=type, type=type.lower(), constraint=row[1], children=row[2].split('-')), modelType)
-                            # Split and add each child to the set
-                            for child in row[2].split('-'):
-                                self.addToSet(child, modelType)
-                                self.addNode(CFMNode(name=child, parent=row[0], type=type.lower(), constraint=row[1], children=[]), modelType)
-            # Set up depth
-            for node in self.cfmnodes:
-                if node.name == "Context" or node.name == "Feature":
-                    self.set_node_depth(node, 0, self.cfmnodes)
-                if node.parent == "Context" or node.parent == "Feature":
-                    self.set_node_depth(node, 1, self.cfmnodes)
+        for parent, constraint, children in self.validator.iterRelations(filename, modelType):
+            # Add parent and each of its children to the registry
+            self.addRelation(parent, constraint, children, modelType)
+        # Set up parents and depth
+        self.registry.finalize(modelType)
 
     def processMappingFile(self, filename):
         """ 
-        Reads the content of the mapping file and sets a tuple containing two dictionaries. 
-
-        The first dictionary maps contexts to sets of features that they activate. 
-        The second dictionary maps features to sets of contexts that activate them. 
+        Reads the content of the mapping file into the mapping index, which maps contexts to the sets of features
+        they activate and features to the sets of contexts that activate them, over all the lines.
+        The lines are checked by the validator, the ones naming undefined nodes being recorded and skipped.
         """
-        if filename is None:
-            print("Please, provide a valid mapping.txt file.\n")
-            sys.exit()
-
-        else:
-            with open(filename) as f:
-                for line in f:
-                    # Extract Contexts-ACTIVATES-Features
-                    mapContexts, mapFeatures = map(str.split, line.strip().split('-ACTIVATES-'))
-
-                    self.checkMappingDefinitions(mapContexts, "context")
-                    self.checkMappingDefinitions(mapFeatures, "feature")
-
-                    self.dictContext.update({context: mapFeatures for context in mapContexts})
-                    self.dictFeature.update({feature: mapContexts for feature in mapFeatures})
+        for mapContexts, mapFeatures in self.validator.iterMapping(filename):
+            self.mapping.add(mapContexts, mapFeatures)
 
     # ---------------------------
     # --------- STEP 2 ----------
@@ -192,88 +278,119 @@ class CFMmodel:
 
     def generateConnectedPairs(self):
         """
-        Generates connected pairs between CFM nodes. This method iterates through the CFM nodes and establishes connected pairs 
-        between them based on certain conditions. The connected pairs are stored in the 'connectedPairs' attribute of each CFM node
-        and in the self.connectedPairs list.
+        Generates connected pairs between CFM nodes with the selected engine. The connected pairs are stored in the
+        self.connectedPairs list.
+        """
+        self.connectedPairs = list(self.streamConnectedPairs())
+
+    def iterConnectedPairs(self):
+        """
+        Returns an iterator over the connected pairs: the stored ones if they have already been generated,
+        otherwise they are generated on demand.
         """
-        setConnectedPairs = set()
-        dictContexts = self.flattenDict(self.dictContext)
-        dictFeatures = self.flattenDict(self.dictFeature)
+        if self.connectedPairs is not None:
+            return iter(self.connectedPairs)
+        return self.streamConnectedPairs()
 
-        for context in self.cfmcontexts:
-            for feature in self.cfmfeatures:
-                for childContext in context.children:
-                    for childFeature in feature.children:
-                        if childContext not in dictContexts or childFeature not in dictFeatures:
-                            continue
-                        if childFeature in dictContexts[childContext] or childContext in dictFeatures[childFeature]:
+    def streamConnectedPairs(self):
+        """
+        Yields the connected pairs found by the selected engine, without duplicates, as soon as they are found.
+        """
+        # Only the python engine tests the child pairs one by one in this process (cfr. iterConnectedPairsPython).
+        if self.engine != "python":
+            self.stats.candidatePairs = None
+
+        if self.engine == "numpy":
+            engine = CFMMatrixEngine(self.registry, self.mapping)
+            connectedPairs = engine.iterConnectedPairs()
+        elif self.engine == "parallel":
+            connectedPairs = CFMSharder(self, self.workers).iterConnectedPairs()
+        else:
+            connectedPairs = self.iterConnectedPairsPython()
+
+        seen = set()
+        for connectedPair in connectedPairs:
+            self.stats.pairsEmitted += 1
+            if connectedPair in seen:
+                self.stats.duplicatesDropped += 1
+                continue
+            seen.add(connectedPair)
+            yield connectedPair
+
+    def featureRelationIndex(self):
+        """
+        Returns the feature child -> indexes (in order) of the feature relationships listing it, built once.
+        """
+        if self.featureRelations is None:
+            index = {}
+            for i, (feature, constraint, children) in enumerate(self.registry.relations["features"]):
+                for child in children:
+                    indexes = index.setdefault(child, [])
+                    if not indexes or indexes[-1] != i:
+                        indexes.append(i)
+            self.featureRelations = index
+        return self.featureRelations
+
+    def iterConnectedPairsPython(self, relations=None, mapping=None):
+        """
+        Generates connected pairs between CFM nodes. This method iterates through the relationships of the registry (or
+        through the given context relationships only) and establishes connected pairs between them based on certain
+        conditions. Yields the connected pairs, duplicates included.
+        Only the feature relationships listing a feature activated by the children of the context relationship are
+        visited, in the order of the registry (cfr. featureRelationIndex).
+        """
+        if mapping is None:
+            mapping = self.mapping
+        dictContexts = mapping.features
+        dictFeatures = mapping.contexts
+        registry = self.registry
+        if relations is None:
+            relations = registry.relations["contexts"]
+        relationsFeature = registry.relations["features"]
+        featureRelations = self.featureRelationIndex()
+
+        for context, constraintContext, childrenContext in relations:
+            relationContext = (constraintContext, childrenContext)
+            reached = mapping.activatedBy(childrenContext)
+            if not reached:
+                continue
+            indexes = set()
+            for feature in reached:
+                indexes.update(featureRelations.get(feature, ()))
+            examined = 0
+            for index in sorted(indexes):
+                feature, constraintFeature, childrenFeature = relationsFeature[index]
+                relationFeature = (constraintFeature, childrenFeature)
+                for childContext in childrenContext:
+                    activated = dictContexts.get(childContext)
+                    if not activated:
+                        continue
+                    examined += len(childrenFeature)
+                    for childFeature in childrenFeature:
+                        if childFeature in activated:
 
                             if context.name not in dictContexts and feature.name not in dictFeatures:
                                 if context.name != "Context" and feature.name != "Feature":
-                                    setConnectedPairs.add(str({'parentContext': context.name,
-                                            'constraintContext': context.constraint,
-                                            'childrenContext': context.children,
-                                            'parentFeature': feature.name,
-                                            'constraintFeature': feature.constraint,
-                                            'childrenFeature': feature.children}))
-                                    #if feature.name not in context.connectedPairs:
-                                    #    context.connectedPairs.append(
-                                    #        feature.name)
+                                    yield self.connectedPair(context.name, relationContext,
+                                                             feature.name, relationFeature)
 
                             if context.name not in dictContexts and feature.name in dictFeatures:
-                                for fea in self.cfmfeatures:
-                                    if childFeature == fea.name:
-                                        setConnectedPairs.add(str({'parentContext': context.name,
-                                             'constraintContext': context.constraint,
-                                             'childrenContext': context.children,
-                                             'parentFeature': childFeature,
-                                             'constraintFeature': fea.constraint,
-                                             'childrenFeature': fea.children}))
-                                #if childFeature not in context.connectedPairs:
-                                #    context.connectedPairs.append(childFeature)
-
-                            if context.parent == "Context" and context.constraint not in ["Alternative", "Or"]:
-                                if feature.parent == "Feature":
-                                    #for con in self.cfmcontexts:
-                                    #    if childContext == con.name and childFeature not in con.connectedPairs:
-                                    #        con.connectedPairs.append(
-                                    #            childFeature)
-                                    for fea in self.cfmfeatures:
-                                        for con in self.cfmcontexts:
-                                            if childFeature == fea.name and childContext == con.name:
-                                                setConnectedPairs.add(str({'parentContext': childContext,
-                                                'constraintContext': con.constraint,
-                                                'childrenContext': con.children,
-                                                'parentFeature': childFeature,
-                                                'constraintFeature': fea.constraint,
-                                                'childrenFeature': fea.children}))
-                                else:
-                                    #for con in self.cfmcontexts:
-                                    #    if childContext == con.name and feature.name not in con.connectedPairs:
-                                    #        con.connectedPairs.append(
-                                    #            feature.name)
-                                    for con in self.cfmcontexts:
-                                        if childContext == con.name:
-                                            setConnectedPairs.add(str({'parentContext': childContext,
-                                                'constraintContext': con.constraint,
-                                                'childrenContext': con.children,
-                                                'parentFeature': feature.name,
-                                                'constraintFeature': feature.constraint,
-                                                'childrenFeature': feature.children}))
-
-                            elif feature.name == "Feature" and feature.constraint not in ["Alternative", "Or"]:
-                                for fea in self.cfmfeatures:
-                                    if childFeature == fea.name:
-                                        setConnectedPairs.add(str({'parentContext': context.name,
-                                             'constraintContext': context.constraint,
-                                             'childrenContext': context.children,
-                                             'parentFeature': childFeature,
-                                             'constraintFeature': fea.constraint,
-                                             'childrenFeature': fea.children}))
-                                #if childFeature not in context.connectedPairs:
-                                #    context.connectedPairs.append(childFeature)
-
-        self.connectedPairs = self.evalSet(setConnectedPairs)
+                                for fea in registry.getRelations(childFeature, "features"):
+                                    yield self.connectedPair(context.name, relationContext,
+                                                             childFeature, fea)
+
+                            if constraintContext not in ["Alternative", "Or"]:
+                                for fea in registry.getRelations(childFeature, "features"):
+                                    for con in registry.getRelations(childContext, "contexts"):
+                                        yield self.connectedPair(childContext, con,
+                                                                 childFeature, fea)
+
+                            elif feature.name == "Feature" and constraintFeature not in ["Alternative", "Or"]:
+                                for fea in registry.getRelations(childFeature, "features"):
+                                    yield self.connectedPair(context.name, relationContext,
+                                                             childFeature, fea)
+            self.stats.countCandidates(examined)
+
 
     # ---------------------------
     # --------- STEP 3 ----------
@@ -284,175 +401,157 @@ class CFMmodel:
         """
         Generates mutants based on connected pairs. This method generates mutants by iterating through the connected pairs 
         and applying specific mutations based on the constraints of the parent context and parent feature. The mutants are 
-        stored in self.mutants, and corresponding questions, mutations to be performed and expected answers for evaluation 
-        are stored self.questions.
+        stored in self.mutants, and corresponding questions, mutations to be performed, expected answers for evaluation
+        and signatures of the mutants are stored self.questions.
         """
-        path = "models/mutants/"
-        modelFile = open(path+"mutations.txt", "w")
-        count = 0
-
-        for connectedPair in self.connectedPairs:
-            parentContext = connectedPair['parentContext']
-            parentFeature = connectedPair['parentFeature']
-            childrenContext = ','.join(connectedPair['childrenContext'])
-            childrenFeature = ','.join(connectedPair['childrenFeature'])
-            modelFile.write("Connected Pair processed: <"+parentContext+","+parentFeature+"> \n")
-            contextConstraint = connectedPair['constraintContext']
-            constraintFeature = connectedPair['constraintFeature']
-
-            # If constraintContext is Alternative and constraintFeature is Alternative:
-            if contextConstraint == 'Alternative' and constraintFeature == 'Alternative':
-                # Apply AltToOr.
-                mutant = self.modifyConstraint('Or', 'Or', connectedPair)
-                mutation = "Modify the constraints of " + parentContext+" context and "+parentFeature+" feature from Alternatives to Or constraints"
-                modelFile.write("Applying AltToOr to "+parentContext+" and "+parentFeature+". \n")
-                self.mutants.append(mutant)
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts and for "+childrenFeature+" features to be activated simultaneously?",'mutation': mutation, 'answer':['yes','y']})
-
-            # If constraintContext is Alternative and constraintFeature is Or:
-            if contextConstraint == 'Alternative' and constraintFeature == 'Or':
-
-                # Apply AltToOr.
-                mutant = self.modifyConstraint('Or', 'Or', connectedPair)
-                mutation = "Modify the constraint of " + parentContext+" context from Alternative to Or constraint"
-                modelFile.write("Applying AltToOr to "+parentContext+". \n")
-                self.mutants.append(mutant)
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts to be activated simultaneously?",'mutation': mutation, 'answer':['yes','y']})
-
-
-                # Apply OrToAlt.
-                mutant = self.modifyConstraint('Alternative', 'Alternative', connectedPair)
-                mutation2 = "Modify the constraint of " + parentFeature+" feature from Or to Alternative constraint"
-                modelFile.write("Applying OrToAlt to "+parentFeature+". \n")
-                self.mutants.append(mutant)
-                self.questions.append({'question':"Is it possible for "+childrenFeature+" features to be activated simultaneously?",'mutation': mutation2, 'answer':['no','n']})
-                count += 1
-
-            # If constraintContext is Or and constraintFeature is Alternative:
-            if contextConstraint == 'Or' and constraintFeature == 'Alternative':
-
-                # Apply OrToAlt.
-                mutant = self.modifyConstraint('Alternative', 'Alternative', connectedPair)
-                mutation = "Modify the constraint of " + parentContext+" context from Or to Alternative constraint"
-                modelFile.write("Applying OrToAlt to "+parentContext+". \n")
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts to be activated simultaneously?",'mutation': mutation, 'answer':['no','n']})
-                self.mutants.append(mutant)
-
-                # Apply AltToOr.
-                mutant = self.modifyConstraint('Or', 'Or', connectedPair)
-                mutation2 = "Modify the constraint of " + parentFeature+" feature from Alternative to Or constraint"
-                modelFile.write("Applying AltToOr to "+parentFeature+". \n")
-                self.questions.append({'question':"Is it possible for "+childrenFeature+" features to be activated simultaneously?",'mutation': mutation2, 'answer':['yes','y']})
-                self.mutants.append(mutant)
-                count += 1
-
-            # If both constraints are Or:
-            if contextConstraint == 'Or' and constraintFeature == 'Or':
-
-                # Apply OrToAlt.
-                mutant = self.modifyConstraint('Alternative', 'Alternative', connectedPair)
-                mutation = "Modify the constraints of " + parentContext+" context and "+parentFeature+" feature from Or to Alternative constraints"
-                modelFile.write("Applying OrToAlt to " + parentContext+" and "+parentFeature+"\n")
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts and for "+childrenFeature+" features to be activated simultaneously?",'mutation': mutation, 'answer':['no','n']})
-                self.mutants.append(mutant)
-
-                # Apply OrToOpt
-                mutant = self.modifyConstraint('Optional', 'Optional', connectedPair)
-                mutation2 = "Modify the constraints of " + parentContext+" context and "+parentFeature+" feature from Or to Optional constraints"
-                modelFile.write("Applying OrToOpt to " +parentContext+" and "+parentFeature+"\n")
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts and for "+childrenFeature+" features to be deactivated simultaneously?",'mutation': mutation2, 'answer':['yes','y']})
-                self.mutants.append(mutant)
-                count += 1
-
-            # If constraintContext is Alternative and constraintFeature is Optional or Mandatory:
-            if contextConstraint == 'Alternative' and (constraintFeature == 'Optional' or constraintFeature == 'Mandatory'):
-                # Apply AltToOr.
-                mutant = self.modifyConstraint('Or', constraintFeature, connectedPair)
-                mutation = "Modify the constraint of " + parentContext+" context from Alternative to Or constraint"
-                modelFile.write("Applying AltToOr to " + parentContext+". \n")
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts to be activated simultaneously?",'mutation': mutation, 'answer':['yes','y']})
-                self.mutants.append(mutant)
-
-            # If constraintContext is Or and constraintFeature is Optional or Mandatory:
-            if contextConstraint == 'Or' and (constraintFeature == 'Optional' or constraintFeature == 'Mandatory'):
-                # Apply OrToAlt.
-                mutant = self.modifyConstraint('Alternative', constraintFeature, connectedPair)
-                mutation = "Modify the constraint of " + parentContext+" context from Or to Alternative constraint"
-                modelFile.write("Applying OrToAlt to " + parentContext+". \n")
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts to be activated simultaneously?",'mutation': mutation, 'answer':['no','n']})
-                self.mutants.append(mutant)
-
-                # Apply OrToOpt.
-                mutant = self.modifyConstraint('Optional', constraintFeature, connectedPair)
-                mutation2 = "Modify the constraint of " + parentContext+" context from Or to Optional constraint"
-                modelFile.write("Applying OrToOpt to " + parentContext+". \n")
-                self.questions.append({'question':"Is it possible for "+childrenContext+" contexts to be deactivated simultaneously?",'mutation': mutation2, 'answer':['yes','y']})
+        self.mutants = []
+        self.questions = []
+        self.mutationsLog = []
+        # The records of the structured sinks are written while the mutants are generated, the text log at the end.
+        with self.openReport() as report:
+            for mutant, question in self.streamMutants(self.connectedPairs, self.mutationsLog.append,
+                                                       record=report.record):
                 self.mutants.append(mutant)
-                count += 1
+                self.questions.append(question)
+            report.lines(self.mutationsLog)
 
-            # If constraintContext is Mandatory and constraintFeature is Optional:
-            if contextConstraint == 'Mandatory' and constraintFeature == 'Optional':
+    def iterMutants(self):
+        """
+        Returns an iterator over the (mutant, question) items: the stored ones if they have already been generated,
+        otherwise they are generated on demand from the connected pairs.
+        """
+        if self.mutants is not None:
+            return zip(self.mutants, self.questions)
+        return self.streamMutants(self.iterConnectedPairs())
 
-                # Apply ManToOpt.
-                mutant = self.modifyConstraint('Optional', 'Optional', connectedPair)
-                mutation = "Modify the constraint of " + parentContext+" context from Mandatory to Optional constraint"
-                modelFile.write("Applying ManToOpt to " + parentContext+". \n")
-                self.questions.append({'question':"Do "+parentContext+" context(s) have to be activated in any configuration?",'mutation': mutation, 'answer':['no','n']})
-                self.mutants.append(mutant)
+    def iterQuestions(self):
+        """
+        Returns an iterator over the questions, generated on demand if needed (cfr. iterMutants).
+        """
+        return (question for mutant, question in self.iterMutants())
 
-            count += 1
-            modelFile.write("\n")
+    def iterHigherOrderMutants(self, order=2, budget=None, seed=None):
+        """
+        Returns an iterator over the higher-order mutants combining order first-order mutants of distinct nodes, as
+        tuples of (mutant, question) items: at most budget of them, sampled at random with seed if it is given
+        (cfr. CFMhigherorder.py).
+        """
+        return CFMHigherOrder(self, order).iterMutants(budget, seed)
 
+    def iterOverlays(self, items=None):
+        """
+        Returns an iterator over the (overlay, question) couples of the mutants (of the (mutant, question) items if
+        given): complete mutated models sharing this model and storing their changes only (cfr. CFMoverlay.py).
+        """
+        return CFMOverlayIndex(self).iterOverlays(self.iterMutants() if items is None else items)
 
-        modelFile.write("Total mutant generated: "+str(count)+"\n")
-        modelFile.close()
+    def streamMutants(self, connectedPairs, write=None, counted=True, record=None):
+        """
+        Yields a (mutant, question) item for each mutation applied to the connected pairs, as soon as it is generated.
+        The processed connected pairs and applied mutations are logged through write, if provided, and given as
+        records (cfr. CFMreport.py) to record, if provided. The mutants are counted in self.stats unless counted is
+        False.
+        """
+        if write is None:
+            write = lambda line: None
+        countMutant = self.stats.countMutant if counted else lambda operator: None
+        lookup = self.operators.lookup
+        count = 0
+        index = -1
+
+        for index, connectedPair in enumerate(connectedPairs):
+            parentContext = connectedPair.parentContext
+            parentFeature = connectedPair.parentFeature
+            write("Connected Pair processed: <"+parentContext+","+parentFeature+"> \n")
+            # Operators applying to the constraints of the pair (cfr. CFMoperators.py), in order of application.
+            operators = lookup(connectedPair.constraintContext, connectedPair.constraintFeature)
+            if record is not None:
+                record(pairRecord(index, connectedPair, len(operators)))
+            if operators:
+                fields = {'parentContext': parentContext, 'parentFeature': parentFeature,
+                          'childrenContext': ','.join(connectedPair.childrenContext),
+                          'childrenFeature': ','.join(connectedPair.childrenFeature)}
+            for operator in operators:
+                mutant, question, log = operator.apply(connectedPair, fields)
+                write(log)
+                if record is not None:
+                    record(mutationRecord(index, operator, mutant, question))
+                countMutant(operator.name)
+                yield mutant, question
+
+            # One per connected pair, or one per mutant for the pairs with several.
+            count += max(1, len(operators))
+            write("\n")
+
+
+        write("Total mutant generated: "+str(count)+"\n")
+        if record is not None:
+            record(totalRecord(index + 1, count))
 
     # ---------------------------
     # --------- STEP 4 ----------
     # ------- MUTANT Q&A --------
     # ---------------------------
 
-    def launchRecommendationSystem(self):
+    def groupMutants(self):
+        """
+        Returns the (question, mutants) couples of the model, the mutants with the same signature sharing a single
+        question (cfr. ConnectedPair.signature).
+        """
+        return groupMutants(self.iterMutants())
+
+    def evaluate(self, oracle, deduplicate=True):
+        """
+        Answers every question of the model with oracle, without any pause, and returns the CFMResult
+        (mutation score, killed and surviving mutants, suggestions). Unless deduplicate is False, the question of
+        mutants with the same signature is only asked once.
+        """
+        return evaluate(self.iterMutants(), oracle, deduplicate)
+
+    def killMutants(self, maxNodes=500000):
+        """
+        Decides every mutant without any question from the configuration space of the model, and returns the CFMResult:
+        the mutants changing the set of valid configurations are killed, the equivalent ones survive.
+        """
+        return CFMConfigurationSpace(self, maxNodes).evaluate()
+
+    def identity(self):
+        """
+        Returns the identity of the model in an answer store: the directory of its contexts file, which stays the same
+        when the files of the model are edited.
+        """
+        return os.path.dirname(os.path.abspath(self.files[0]))
+
+    def launchRecommendationSystem(self, oracle=None, deduplicate=True, store=None):
+        """
+        Asks the questions with oracle (interactively by default) and prints the mutation score and suggestions. With
+        an answer store (cfr. CFManswers.py), the questions already answered for this model are not asked again.
+        """
+        if oracle is None:
+            oracle = CFMInteractiveOracle()
+        if store is not None:
+            oracle = CFMStoredOracle(store, self.identity(), oracle)
         print()
         print("╔══════════════════════════════════════════════╗")
         print("║   The recommendation system will start,      ║")
         print("║   answer each question carefully. Accepted   ║")
         print("║   answers are among (yes, y, no, n).         ║")
         print("╚══════════════════════════════════════════════╝")
-        sleep(0.5)
-        count = 1
-        nbr_mutations = 0
-        mutations = set()
-        for question in self.questions:
-            print("")
-            print("Question "+str(count)+ ":")
-            print("══════════")
-            while True:
-                response = input(question['question'] + " (yes/no): \n").lower()
-                if response == "yes" or response == "y":
-                    if response in question['answer']:
-                        nbr_mutations += 1 
-                        print("Suggestion: " + question['mutation'])
-                        mutations.add(question['mutation'])
-                        sleep(0.5)
-                    break
-                elif response == "no" or response == "n":
-                    if response in question['answer']:
-                        nbr_mutations += 1 
-                        print("Suggestion: " + question['mutation'])
-                        mutations.add(question['mutation'])
-                        sleep(0.5)
-                    break
-                else:
-                    print("Invalid response. Please enter 'yes', 'y', 'no' or 'n'.")
-            count+=1
+        sleep(oracle.delay)
+        result = self.evaluate(oracle, deduplicate)
+        killed, total = result.score
         print("╔══════════════════════════════════════════════╗")
         print("║            The process is now over.          ║")
-        print("║            Mutation score: " + str(len(self.questions) - nbr_mutations) + "/" + str(len(self.questions)) + ".              ║")
+        print("║            Mutation score: " + str(killed) + "/" + str(total) + ".              ║")
         print("╚══════════════════════════════════════════════╝")
+        if result.saved:
+            print("Questions saved by deduplication: " + str(result.saved) + ".")
+        if store is not None:
+            print("Answers reused from the store: " + str(oracle.reused) + ".")
         print("Summary of the recommendations:")
-        for mut in mutations:
+        for mut in result.suggestions:
             print("- " + mut)
+        return result
 
 
 
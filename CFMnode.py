@@ -1,11 +1,21 @@
+# Number of children of a parent above which they are also kept in a set, so that adding a relationship does not
+# scan them (cfr. CFMRegistry.addRelation and CFMCompactTree.addRelation); scanning a short list is faster.
+SIBLINGS_SCANNED = 16
+
+# Roots of the context and feature trees.
+ROOTS = {"contexts": "Context", "features": "Feature"}
+
 class CFMNode:
-    def __init__(self, name=None, type=None, parent=None, constraint=None, children=[], depth=0):
+    __slots__ = ('name', 'parent', 'type', 'constraint', 'children', 'depth', 'groups', 'connectedPairs')
+
+    def __init__(self, name=None, type=None, parent=None, constraint=None, children=None, depth=0):
         self.name = name
         self.parent = parent
         self.type = type              # either contexts or features.
         self.constraint = constraint  # either "Alternative", "Or", "Optional" or "Mandatory".
-        self.children = children      # List of children, if any.
+        self.children = children if children is not None else []  # List of children, if any.
         self.depth = depth            # 0 = root either "context" or "feature" in the CFM model.
+        self.groups = []              # List of (constraint, children tuple) relationships defined with this node as parent.
         self.connectedPairs = []      # List to keep track of the nodes associated (cfr. connectedPairs).
 
         # Initialise the root connections
@@ -28,4 +38,59 @@ class CFMNode:
         print("Depth: " + str(self.depth))
         print("Connected Pairs: ")
         self.printList(self.connectedPairs)
-    
\ No newline at end of file
+
+class CFMNodeView:
+    """
+    Read-only CFMNode backed by the arrays of a compact tree (cfr. CFMcompact.py), built on access. It only holds the
+    tree and the integer id of the node.
+    """
+    __slots__ = ('tree', 'id')
+
+    def __init__(self, tree, id):
+        self.tree = tree
+        self.id = id
+
+    def __eq__(self, other):
+        return isinstance(other, CFMNodeView) and self.tree is other.tree and self.id == other.id
+
+    def __hash__(self):
+        return hash((id(self.tree), self.id))
+
+    def __repr__(self):
+        return "CFMNodeView(" + self.name + ")"
+
+    @property
+    def name(self):
+        return self.tree.names[self.id]
+
+    @property
+    def type(self):
+        return self.tree.modelType[:-1]
+
+    @property
+    def parent(self):
+        return self.tree.parentName(self.id)
+
+    @property
+    def constraint(self):
+        return self.tree.constraintName(self.tree.constraint[self.id])
+
+    @property
+    def children(self):
+        return self.tree.children(self.id)
+
+    @property
+    def depth(self):
+        return self.tree.depth[self.id]
+
+    @property
+    def groups(self):
+        return self.tree.groups(self.id)
+
+    @property
+    def connectedPairs(self):
+        return {"Context": ["Feature"], "Feature": ["Context"]}.get(self.name, [])
+
+    printList = CFMNode.printList
+    printNode = CFMNode.printNode
+
@@ -0,0 +1,153 @@
+# Author: Audric Deckers
+from CFMpair import *
+
+# Expected answers of the questions, as accepted by the recommendation system.
+YES = ('yes', 'y')
+NO = ('no', 'n')
+
+class CFMOperator:
+    """
+    Mutation operator declared as data: it applies to the connected pairs whose (context constraint, feature
+    constraint) is in applies, sets the constraint of side (contexts, features or both) to constraint and asks the
+    question whose expected answer is answer. The question, mutation and log templates are formatted with the
+    parentContext, parentFeature, childrenContext and childrenFeature (comma-separated) of the connected pair.
+    """
+    __slots__ = ('name', 'side', 'applies', 'constraint', 'answer', 'templates', 'question', 'mutation', 'log')
+
+    def __init__(self, name, side, applies, constraint, answer, question, mutation, log):
+        if side not in ["contexts", "features", "both"]:
+            raise ValueError("The side of a mutation operator is either contexts, features or both.")
+        self.name = name
+        self.side = side
+        self.applies = tuple(applies)
+        self.constraint = constraint
+        self.answer = tuple(answer)
+        # Templates are kept as declared (cfr. declaration) and bound once: formatting is a single call per mutant.
+        self.templates = (question, mutation, log)
+        self.question = question.format_map
+        self.mutation = mutation.format_map
+        self.log = log.format_map
+
+    def __repr__(self):
+        return "CFMOperator(" + self.name + ", " + self.side + ")"
+
+    def declaration(self):
+        """
+        Returns every declared field of the operator, which together decide its mutants (cfr.
+        CFMOperatorRegistry.variant).
+        """
+        return (self.name, self.side, self.applies, self.constraint, self.answer) + self.templates
+
+    def apply(self, connectedPair, fields):
+        """
+        Returns the mutant of connectedPair, its question and its log line, fields being the values of the templates.
+        """
+        contextConstraint = self.constraint if self.side != "features" else connectedPair.constraintContext
+        featureConstraint = self.constraint if self.side != "contexts" else connectedPair.constraintFeature
+        mutant = ConnectedPair(connectedPair.parentContext, contextConstraint, connectedPair.childrenContext,
+                               connectedPair.parentFeature, featureConstraint, connectedPair.childrenFeature)
+        question = {'question': self.question(fields), 'mutation': self.mutation(fields), 'answer': list(self.answer),
+                    'signature': connectedPair.signature(mutant)}
+        return mutant, question, self.log(fields)
+
+# Operators applied by default, in the order in which they are applied to a connected pair.
+DEFAULT_OPERATORS = [
+    CFMOperator("AltToOr", "both", [("Alternative", "Alternative")], "Or", YES,
+                "Is it possible for {childrenContext} contexts and for {childrenFeature} features to be activated simultaneously?",
+                "Modify the constraints of {parentContext} context and {parentFeature} feature from Alternatives to Or constraints",
+                "Applying AltToOr to {parentContext} and {parentFeature}. \n"),
+    CFMOperator("AltToOr", "contexts", [("Alternative", "Or"), ("Alternative", "Optional"), ("Alternative", "Mandatory")], "Or", YES,
+                "Is it possible for {childrenContext} contexts to be activated simultaneously?",
+                "Modify the constraint of {parentContext} context from Alternative to Or constraint",
+                "Applying AltToOr to {parentContext}. \n"),
+    CFMOperator("OrToAlt", "contexts", [("Or", "Alternative"), ("Or", "Optional"), ("Or", "Mandatory")], "Alternative", NO,
+                "Is it possible for {childrenContext} contexts to be activated simultaneously?",
+                "Modify the constraint of {parentContext} context from Or to Alternative constraint",
+                "Applying OrToAlt to {parentContext}. \n"),
+    CFMOperator("OrToOpt", "contexts", [("Or", "Optional"), ("Or", "Mandatory")], "Optional", YES,
+                "Is it possible for {childrenContext} contexts to be deactivated simultaneously?",
+                "Modify the constraint of {parentContext} context from Or to Optional constraint",
+                "Applying OrToOpt to {parentContext}. \n"),
+    CFMOperator("OrToAlt", "features", [("Alternative", "Or")], "Alternative", NO,
+                "Is it possible for {childrenFeature} features to be activated simultaneously?",
+                "Modify the constraint of {parentFeature} feature from Or to Alternative constraint",
+                "Applying OrToAlt to {parentFeature}. \n"),
+    CFMOperator("AltToOr", "features", [("Or", "Alternative")], "Or", YES,
+                "Is it possible for {childrenFeature} features to be activated simultaneously?",
+                "Modify the constraint of {parentFeature} feature from Alternative to Or constraint",
+                "Applying AltToOr to {parentFeature}. \n"),
+    CFMOperator("OrToAlt", "both", [("Or", "Or")], "Alternative", NO,
+                "Is it possible for {childrenContext} contexts and for {childrenFeature} features to be activated simultaneously?",
+                "Modify the constraints of {parentContext} context and {parentFeature} feature from Or to Alternative constraints",
+                "Applying OrToAlt to {parentContext} and {parentFeature}\n"),
+    CFMOperator("OrToOpt", "both", [("Or", "Or")], "Optional", YES,
+                "Is it possible for {childrenContext} contexts and for {childrenFeature} features to be deactivated simultaneously?",
+                "Modify the constraints of {parentContext} context and {parentFeature} feature from Or to Optional constraints",
+                "Applying OrToOpt to {parentContext} and {parentFeature}\n"),
+    # The feature is already Optional, only the context changes.
+    CFMOperator("ManToOpt", "contexts", [("Mandatory", "Optional")], "Optional", NO,
+                "Do {parentContext} context(s) have to be activated in any configuration?",
+                "Modify the constraint of {parentContext} context from Mandatory to Optional constraint",
+                "Applying ManToOpt to {parentContext}. \n"),
+]
+
+# Operators available but not applied by default, e.g. CFMOperatorRegistry(DEFAULT_OPERATORS + OPTIONAL_OPERATORS).
+OPTIONAL_OPERATORS = [
+    CFMOperator("OptToMan", "contexts", [("Optional", "Mandatory"), ("Optional", "Optional")], "Mandatory", YES,
+                "Do {parentContext} context(s) have to be activated in any configuration?",
+                "Modify the constraint of {parentContext} context from Optional to Mandatory constraint",
+                "Applying OptToMan to {parentContext}. \n"),
+    CFMOperator("ManToAlt", "contexts", [("Mandatory", "Alternative"), ("Mandatory", "Or")], "Alternative", NO,
+                "Is it possible for {childrenContext} contexts to be activated simultaneously?",
+                "Modify the constraint of {parentContext} context from Mandatory to Alternative constraint",
+                "Applying ManToAlt to {parentContext}. \n"),
+]
+
+class CFMOperatorRegistry:
+    """
+    Registry of the mutation operators, compiled on first use into a (context constraint, feature constraint) ->
+    operators table, so that the operators of a connected pair are found with a single lookup whatever their number.
+    Registering an operator recompiles the table on the next lookup.
+    """
+    def __init__(self, operators=None):
+        self.operators = []
+        self.table = None
+        self.register(*(DEFAULT_OPERATORS if operators is None else operators))
+
+    def register(self, *operators):
+        for operator in operators:
+            if not isinstance(operator, CFMOperator):
+                raise TypeError("Only CFMOperator can be registered, not " + repr(operator) + ".")
+            self.operators.append(operator)
+        self.table = None
+
+    def compile(self):
+        table = {}
+        for operator in self.operators:
+            for constraints in operator.applies:
+                table.setdefault(constraints, []).append(operator)
+        self.table = {constraints: tuple(operators) for constraints, operators in table.items()}
+
+    def lookup(self, contextConstraint, featureConstraint):
+        """
+        Returns the operators applying to the (contextConstraint, featureConstraint) connected pairs, in order.
+        """
+        if self.table is None:
+            self.compile()
+        return self.table.get((contextConstraint, featureConstraint), ())
+
+    def names(self):
+        return list(dict.fromkeys(operator.name for operator in self.operators))
+
+    def variant(self):
+        """
+        Returns the part of the cache key identifying these operators, empty for the default ones. It is made of the
+        whole declaration of every operator, so that operators sharing a name and side but not their mutants never
+        share cache entries.
+        """
+        if self.operators == DEFAULT_OPERATORS:
+            return ""
+        return "operators:" + repr([operator.declaration() for operator in self.operators])
+
+# Registry of the default operators, compiled once per process and shared by the models.
+DEFAULT_REGISTRY = CFMOperatorRegistry()
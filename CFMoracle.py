@@ -0,0 +1,175 @@
+# Author: Audric Deckers
+from abc import ABC, abstractmethod
+from time import sleep
+
+# Accepted answers, normalised to "yes" or "no".
+ANSWERS = {"yes": "yes", "y": "yes", "no": "no", "n": "no", True: "yes", False: "no"}
+
+def normalise(answer):
+    """
+    Returns "yes" or "no" for an accepted answer (yes, y, no, n or a boolean), None otherwise.
+    """
+    if isinstance(answer, str):
+        answer = answer.strip().lower()
+    return ANSWERS.get(answer)
+
+class CFMOracle(ABC):
+    """
+    Answers the questions of the recommendation system. Subclasses implement answer(), which returns
+    an accepted answer for the question number index (starting at 1).
+    """
+    # Pause, in seconds, after each suggestion (only used by the interactive front end).
+    delay = 0
+
+    @abstractmethod
+    def answer(self, index, question, mutant):
+        """
+        Returns an accepted answer (cfr. ANSWERS) to question, asked about mutant.
+        """
+
+    def notify(self, index, question, survived):
+        """
+        Called once the answer to a question is known, survived telling whether the suggestion applies.
+        """
+        pass
+
+class CFMDictOracle(CFMOracle):
+    """
+    Answers from a dictionary mapping question texts (or question numbers) to answers.
+    """
+    def __init__(self, answers):
+        self.answers = answers
+
+    def answer(self, index, question, mutant):
+        if question['question'] in self.answers:
+            return self.answers[question['question']]
+        if index in self.answers:
+            return self.answers[index]
+        raise KeyError("No answer for question " + str(index) + ": " + question['question'])
+
+class CFMFileOracle(CFMDictOracle):
+    """
+    Answers from a file with one answer per line, in the order of the questions. A line may also give the answer
+    of a specific question as 'question text<TAB>answer'.
+    """
+    def __init__(self, filename):
+        answers = {}
+        index = 1
+        with open(filename) as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip():
+                    continue
+                if "\t" in line:
+                    question, answer = line.rsplit("\t", 1)
+                    answers[question] = answer
+                else:
+                    answers[index] = line
+                index += 1
+        super().__init__(answers)
+
+class CFMCallableOracle(CFMOracle):
+    """
+    Answers by calling function(question, mutant).
+    """
+    def __init__(self, function):
+        self.function = function
+
+    def answer(self, index, question, mutant):
+        return self.function(question, mutant)
+
+class CFMInteractiveOracle(CFMOracle):
+    """
+    Asks each question in the terminal until an accepted answer is given (the original front end).
+    """
+    delay = 0.5
+
+    def answer(self, index, question, mutant):
+        print("")
+        print("Question "+str(index)+ ":")
+        print("══════════")
+        while True:
+            response = input(question['question'] + " (yes/no): \n")
+            if normalise(response) is not None:
+                return response
+            print("Invalid response. Please enter 'yes', 'y', 'no' or 'n'.")
+
+    def notify(self, index, question, survived):
+        if survived:
+            print("Suggestion: " + question['mutation'])
+            sleep(self.delay)
+
+class CFMResult:
+    """
+    Outcome of a session of the recommendation system. A mutant is killed when the answer rejects the mutated
+    behaviour, and survives (its mutation becomes a suggestion) when the answer matches the expected one.
+    """
+    def __init__(self):
+        self.answers = []     # Normalised answers, in the order of the questions.
+        self.killed = []      # (mutant, question) items of the killed mutants.
+        self.surviving = []   # (mutant, question) items of the surviving mutants.
+        self.suggestions = [] # Mutations suggested by the surviving mutants, without duplicates.
+        self.saved = 0        # Questions not asked, answered by the question of a mutant with the same signature.
+
+    @property
+    def total(self):
+        return len(self.killed) + len(self.surviving)
+
+    @property
+    def score(self):
+        """
+        Mutation score as (killed mutants, total), as printed by the recommendation system.
+        """
+        return (len(self.killed), self.total)
+
+    def mutationScore(self):
+        return len(self.killed) / self.total if self.total else 1.0
+
+    def asDict(self):
+        return {"killed": len(self.killed), "surviving": len(self.surviving), "total": self.total,
+                "mutationScore": self.mutationScore(), "suggestions": list(self.suggestions),
+                "questions": len(self.answers), "saved": self.saved}
+
+def groupMutants(items):
+    """
+    Collapses the (mutant, question) items whose questions have the same signature, and returns the
+    (question, mutants) couples in the order of their first item.
+    """
+    groups = {}
+    for index, (mutant, question) in enumerate(items):
+        groups.setdefault(question.get('signature', index), (question, []))[1].append(mutant)
+    return list(groups.values())
+
+def evaluate(items, oracle, deduplicate=True):
+    """
+    Asks oracle the question of each (mutant, question) item and returns the CFMResult of the session. When
+    deduplicate is set, a question is only asked for the first mutant of its signature, and its answer applies to
+    every mutant with the same signature.
+    """
+    result = CFMResult()
+    suggestions = set()
+    outcomes = {}
+    index = 0
+    for mutant, question in items:
+        signature = question.get('signature') if deduplicate else None
+        if signature is not None and signature in outcomes:
+            survived = outcomes[signature]
+            result.saved += 1
+        else:
+            index += 1
+            answer = normalise(oracle.answer(index, question, mutant))
+            if answer is None:
+                raise ValueError("Invalid answer to question " + str(index) + ", accepted answers are yes, y, no and n.")
+            result.answers.append(answer)
+            survived = answer in question['answer']
+            if survived and question['mutation'] not in suggestions:
+                suggestions.add(question['mutation'])
+                result.suggestions.append(question['mutation'])
+            oracle.notify(index, question, survived)
+            if signature is not None:
+                outcomes[signature] = survived
+        if survived:
+            result.surviving.append((mutant, question))
+        else:
+            result.killed.append((mutant, question))
+    return result
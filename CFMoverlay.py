@@ -0,0 +1,205 @@
+# Author: Audric Deckers
+from CFMnode import *
+from CFMsemantics import constraintParts
+
+class CFMOverlayIndex:
+    """
+    Index of the relationships of a CFM model, built once and shared by the overlays of all its mutants: it locates
+    the relationship line changed by each side of a mutant signature (cfr. ConnectedPair.signature), so that an
+    overlay is made of the changes only.
+    """
+    def __init__(self, model):
+        self.model = model
+        # (model type, parent, constraint, children) -> index of the first such line, and (model type, child,
+        # constraint) -> index of the first line listing child with constraint, for each model type.
+        self.lines = {}
+        self.members = {}
+        # (model type, name) -> indexes of the lines name is the parent or a child of, in order.
+        self.nodeLines = {}
+        for modelType in ["contexts", "features"]:
+            for i, (node, constraint, children) in enumerate(model.registry.relations[modelType]):
+                self.lines.setdefault((modelType, node.name, constraint, frozenset(children)), i)
+                self.nodeLines.setdefault((modelType, node.name), []).append(i)
+                for child in children:
+                    self.members.setdefault((modelType, child, constraint), i)
+                    lines = self.nodeLines.setdefault((modelType, child), [])
+                    if not lines or lines[-1] != i:
+                        lines.append(i)
+
+    def changes(self, question):
+        """
+        Returns the {(model type, line index, member): new constraint} changes of the mutant of question. member is
+        None when the constraint of the whole line changes, or the node whose own constraint changes when the
+        mutated relationship is the one the node is listed in as a child (cfr. CFMRegistry.getRelations).
+        """
+        changes = {}
+        for modelType, parent, constraint, newConstraint, children in question['signature']:
+            if children:
+                index = self.lines.get((modelType, parent, constraint, frozenset(children)))
+                member = None
+            else:
+                index = self.members.get((modelType, parent, constraint))
+                member = parent
+            if index is None:
+                raise KeyError("No " + constraint + " relationship of " + parent + " in the " + modelType + ".")
+            changes[(modelType, index, member)] = newConstraint
+        return changes
+
+    def overlay(self, *questions):
+        """
+        Returns the overlay of the mutant of questions, several questions giving a higher-order mutant.
+        """
+        changes = {}
+        for question in questions:
+            changes.update(self.changes(question))
+        return CFMOverlay(self, changes)
+
+    def iterOverlays(self, items):
+        """
+        Yields the (overlay, question) couple of each (mutant, question) item, e.g. of CFMmodel.iterMutants.
+        """
+        for mutant, question in items:
+            yield self.overlay(question), question
+
+class CFMOverlay:
+    """
+    Copy-on-write mutated CFM model: it shares the nodes, relationships and mapping of the base model and only
+    stores the changed constraints (cfr. CFMOverlayIndex.changes), so that its memory is proportional to its changes.
+    The nodes and relationships are read through the overlay, the nodes touched by a change being copied on access,
+    and the mutated model is exported to the text format line by line.
+    """
+    __slots__ = ('index', 'changes')
+
+    def __init__(self, index, changes):
+        self.index = index
+        self.changes = changes
+
+    @property
+    def model(self):
+        return self.index.model
+
+    def __repr__(self):
+        return "CFMOverlay(" + ", ".join(modelType + ":" + str(index) + ("" if member is None else "/" + member) +
+                                          "=" + constraint
+                                          for (modelType, index, member), constraint in self.changes.items()) + ")"
+
+    # ---------------------------
+    # --------- LOOKUPS ---------
+    # ---------------------------
+
+    def touched(self, modelType):
+        """
+        Returns the set of the indexes of the lines of modelType changed by the overlay.
+        """
+        return {line for changedType, line, member in self.changes if changedType == modelType}
+
+    def relations(self, modelType):
+        """
+        Yields the (parent node, constraint, children) relationships of modelType of the mutated model, one per line.
+        A changed line may be replaced by two lines (cfr. line).
+        """
+        relations, touched = self.model.registry.relations[modelType], self.touched(modelType)
+        for i, relation in enumerate(relations):
+            if i in touched:
+                yield from self.line(modelType, i)
+            else:
+                yield relation
+
+    def line(self, modelType, i):
+        """
+        Returns the relationships of the mutated model replacing the line i of modelType. The changes are applied to
+        the atomic constraints of the line (cfr. constraintParts) as in CFMConfigurationSpace.change: a member changed
+        to Or or Alternative constrains the whole line, a member changed to Mandatory or Optional only itself. The
+        line is then written back with its Or or Alternative constraint, or Optional, and a Mandatory line for the
+        members needing it.
+        """
+        node, constraint, children = self.model.registry.relations[modelType][i]
+        original = constraintParts(constraint, i, children)
+        removed, added = set(), set()
+        for member in [None] + list(dict.fromkeys(children)):
+            newConstraint = self.changes.get((modelType, i, member))
+            if newConstraint is not None:
+                changed = children if member is None else (member,)
+                old, new = constraintParts(constraint, i, changed), constraintParts(newConstraint, i, changed)
+                removed |= old - new
+                added |= new - old
+        parts = (original - removed) | added
+
+        mandatory = tuple(child for child in dict.fromkeys(children) if ("man", i, child) in parts)
+        if ("alo", i) in parts:
+            group = "Alternative" if ("amo", i) in parts else "Or"
+            return [(node, group, children)] + ([(node, "Mandatory", mandatory)] if mandatory else [])
+        if ("amo", i) in parts:
+            raise ValueError("The changes of line " + str(i + 1) + " of the " + modelType + " cannot be written as "
+                             "relationships (at most one child without at least one).")
+        optional = tuple(child for child in dict.fromkeys(children) if child not in mandatory)
+        lines = [(node, "Mandatory", mandatory), (node, "Optional", optional)]
+        if constraint == "Optional":
+            lines.reverse()
+        return [(node, lineConstraint, lineChildren) for node, lineConstraint, lineChildren in lines if lineChildren]
+
+    def getRelations(self, name, modelType):
+        """
+        Returns the (constraint, children) relationships name takes part in, as CFMRegistry.getRelations.
+        """
+        lines = self.index.nodeLines.get((modelType, name), ())
+        if self.touched(modelType).isdisjoint(lines):
+            return self.model.registry.getRelations(name, modelType)
+        memberships, groups = [], []
+        for i in lines:
+            for node, constraint, children in self.line(modelType, i):
+                if name in children and constraint not in memberships:
+                    memberships.append(constraint)
+                if node.name == name:
+                    groups.append((constraint, children))
+        return [(constraint, ()) for constraint in memberships] + groups
+
+    def getNode(self, name, modelType):
+        """
+        Returns the node named name in modelType: the node of the base model, or a copy of it with its constraint and
+        relationships changed when the overlay touches it.
+        """
+        node = self.model.registry.getNode(name, modelType)
+        if node is None or self.touched(modelType).isdisjoint(self.index.nodeLines.get((modelType, name), ())):
+            return node
+        relations = self.getRelations(name, modelType)
+        copy = CFMNode(name=node.name, type=node.type, parent=node.parent, constraint=node.constraint,
+                       children=list(node.children), depth=node.depth)
+        copy.groups = [(constraint, children) for constraint, children in relations if children]
+        memberships = [constraint for constraint, children in relations if not children]
+        if memberships:
+            copy.constraint = memberships[0]
+        elif copy.groups:
+            copy.constraint = copy.groups[0][0]
+        return copy
+
+    def constraintOf(self, name, modelType):
+        node = self.getNode(name, modelType)
+        return None if node is None else node.constraint
+
+    # ---------------------------
+    # --------- EXPORT ----------
+    # ---------------------------
+
+    def lines(self, modelType):
+        """
+        Yields the lines of the contexts.txt or features.txt file (modelType) of the mutated model.
+        """
+        for node, constraint, children in self.relations(modelType):
+            yield node.name + "/" + constraint + "/" + "-".join(children) + "\n"
+
+    def mappingLines(self):
+        """
+        Yields the lines of the mapping.txt file, shared with the base model.
+        """
+        for contexts, features in self.model.mapping.lines:
+            yield "-".join(contexts) + "-ACTIVATES-" + "-".join(features) + "\n"
+
+    def write(self, contextsFile, featuresFile, mappingFile):
+        """
+        Writes the mutated model to the three files, streaming the lines.
+        """
+        for filename, lines in [(contextsFile, self.lines("contexts")), (featuresFile, self.lines("features")),
+                                (mappingFile, self.mappingLines())]:
+            with open(filename, "w") as f:
+                f.writelines(lines)
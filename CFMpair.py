@@ -0,0 +1,79 @@
+# Author: Audric Deckers
+FIELDS = ('parentContext', 'constraintContext', 'childrenContext',
+          'parentFeature', 'constraintFeature', 'childrenFeature')
+
+class ConnectedPair:
+    """
+    Immutable record of a connected pair between a context relationship and a feature relationship.
+    Children are stored as tuples so that pairs (and mutants) can be hashed and compared directly.
+    """
+    __slots__ = FIELDS + ('_hash',)
+
+    def __init__(self, parentContext, constraintContext, childrenContext, parentFeature, constraintFeature, childrenFeature):
+        setField = object.__setattr__
+        setField(self, 'parentContext', parentContext)
+        setField(self, 'constraintContext', constraintContext)
+        setField(self, 'childrenContext', tuple(childrenContext))
+        setField(self, 'parentFeature', parentFeature)
+        setField(self, 'constraintFeature', constraintFeature)
+        setField(self, 'childrenFeature', tuple(childrenFeature))
+        setField(self, '_hash', hash(self.astuple()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConnectedPair is immutable, use replace() instead.")
+
+    def __delattr__(self, name):
+        raise AttributeError("ConnectedPair is immutable.")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, ConnectedPair):
+            return NotImplemented
+        return self._hash == other._hash and self.astuple() == other.astuple()
+
+    def __getitem__(self, key):
+        """
+        Allows the former dictionary access, e.g. connectedPair['parentContext'].
+        """
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self):
+        return "ConnectedPair(<" + self.parentContext + "," + self.parentFeature + ">, " + \
+               self.constraintContext + "/" + self.constraintFeature + ")"
+
+    def __reduce__(self):
+        return (ConnectedPair, self.astuple())
+
+    def astuple(self):
+        return (self.parentContext, self.constraintContext, self.childrenContext,
+                self.parentFeature, self.constraintFeature, self.childrenFeature)
+
+    def asDict(self):
+        return dict(zip(FIELDS, self.astuple()))
+
+    def replace(self, **changes):
+        """
+        Returns a copy of the pair where the given fields are replaced.
+        """
+        fields = self.asDict()
+        fields.update(changes)
+        return ConnectedPair(**fields)
+
+    def signature(self, mutant):
+        """
+        Returns the canonical signature of mutant, a mutant of this pair: the (model type, node whose constraint
+        changes, old constraint, new constraint, sorted children) of each changed side. Mutants of different pairs
+        applying the same changes share their signature, hence their question.
+        """
+        changes = []
+        if mutant.constraintContext != self.constraintContext:
+            changes.append(("contexts", self.parentContext, self.constraintContext, mutant.constraintContext,
+                            tuple(sorted(set(self.childrenContext)))))
+        if mutant.constraintFeature != self.constraintFeature:
+            changes.append(("features", self.parentFeature, self.constraintFeature, mutant.constraintFeature,
+                            tuple(sorted(set(self.childrenFeature)))))
+        return tuple(changes)
@@ -0,0 +1,72 @@
+# Author: Audric Deckers
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Read-only snapshot of the model shared by the relationships computed in a worker process.
+snapshot = None
+
+def initWorker(model):
+    global snapshot
+    snapshot = model
+
+def computeShard(indexes):
+    """
+    Returns, for each context relationship index of the shard, the connected pairs found from it (duplicates included).
+    """
+    model = snapshot
+    relations = model.registry.relations["contexts"]
+    return [(i, list(model.iterConnectedPairsPython([relations[i]]))) for i in indexes]
+
+class CFMSharder:
+    """
+    Splits the connected pair generation of a model by top-level context subtrees (children of Context), computes
+    the shards in worker processes and merges their results in the order of the serial generation.
+    """
+    def __init__(self, model, workers=None):
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+
+    def topLevel(self, node):
+        """
+        Returns the name of the top-level context (child of Context) whose subtree contains node.
+        """
+        registry = self.model.registry
+        visited = set()
+        while node.parent != "Context" and node.parent not in visited:
+            visited.add(node.name)
+            node = registry.getNode(node.parent, "contexts")
+        return node.name
+
+    def shards(self):
+        """
+        Returns the lists of context relationship indexes to compute, one per task. The relationships of a same
+        top-level subtree stay together, and subtrees are spread over the tasks by estimated cost.
+        """
+        relations = self.model.registry.relations["contexts"]
+        subtrees = {}
+        for i, (node, constraint, children) in enumerate(relations):
+            subtrees.setdefault(self.topLevel(node), []).append(i)
+
+        # Every child of a context relationship is examined against every child of every feature relationship.
+        cost = lambda indexes: sum(len(relations[i][2]) for i in indexes)
+        tasks = [[] for i in range(min(len(subtrees), self.workers * 4))]
+        loads = [0] * len(tasks)
+        for indexes in sorted(subtrees.values(), key=cost, reverse=True):
+            lightest = loads.index(min(loads))
+            tasks[lightest].extend(indexes)
+            loads[lightest] += cost(indexes)
+        return [sorted(task) for task in tasks if task]
+
+    def iterConnectedPairs(self):
+        """
+        Yields the connected pairs of every shard (duplicates included) in the order of the serial generation.
+        """
+        model = self.model
+        results = [None] * len(model.registry.relations["contexts"])
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=initWorker,
+                                 initargs=(model,)) as executor:
+            for shard in executor.map(computeShard, self.shards()):
+                for i, pairs in shard:
+                    results[i] = pairs
+        for pairs in results:
+            yield from pairs
@@ -0,0 +1,136 @@
+# Author: Audric Deckers
+from CFMnode import *
+
+class CFMRegistry:
+    def __init__(self):
+        # Name -> CFMNode, one (merged) node per name for each model type.
+        self.contexts = {}
+        self.features = {}
+
+        # Parent name -> list of children names, for each model type, and the same children as a set for the parents
+        # with many children (cfr. SIBLINGS_SCANNED).
+        self.adjacency = {"contexts": {}, "features": {}}
+        self.siblings = {"contexts": {}, "features": {}}
+
+        # Name -> list of the constraints under which the node is listed as a child.
+        self.memberships = {"contexts": {}, "features": {}}
+
+        # Ordered list of (CFMNode, constraint, children tuple) relationships, one per line in the file.
+        self.relations = {"contexts": [], "features": []}
+
+    # ---------------------------
+    # --------- HELPERS ---------
+    # -------- FUNCTIONS --------
+    # ---------------------------
+
+    def nodesOf(self, modelType):
+        """
+        Returns the name -> CFMNode dictionary of modelType = {contexts / features}.
+        """
+        return self.contexts if modelType == "contexts" else self.features
+
+    def getNode(self, name, modelType):
+        """
+        Returns the CFMNode named name in modelType, or None if it is not defined.
+        """
+        return self.nodesOf(modelType).get(name)
+
+    def getOrCreateNode(self, name, modelType):
+        """
+        Returns the CFMNode named name in modelType, creating it if it does not exist yet.
+        A name that appears both as a parent and as a child is merged into a single node.
+        """
+        nodes = self.nodesOf(modelType)
+        node = nodes.get(name)
+        if node is None:
+            node = CFMNode(name=name, type=modelType[:-1])
+            nodes[name] = node
+        return node
+
+    def getChildren(self, name, modelType):
+        """
+        Returns the list of children of name in modelType (empty for leaves).
+        """
+        return self.adjacency[modelType].get(name, [])
+
+    # ---------------------------
+    # ------ REGISTRATION -------
+    # ---------------------------
+
+    def addRelation(self, parent, constraint, children, modelType):
+        """
+        Registers the relationship 'parent/constraint/children' of modelType and merges the
+        nodes involved with the ones already known.
+        """
+        children = tuple(children)
+        parentNode = self.getOrCreateNode(parent, modelType)
+        parentNode.groups.append((constraint, children))
+        if parentNode.constraint is None:
+            parentNode.constraint = constraint
+
+        siblings = self.adjacency[modelType].setdefault(parent, [])
+        known = self.siblings[modelType].get(parent)
+        for child in children:
+            childNode = self.getOrCreateNode(child, modelType)
+            constraints = self.memberships[modelType].setdefault(child, [])
+            if not constraints:
+                # The constraint of a node is the one of the relationship it belongs to.
+                childNode.parent = parent
+                childNode.constraint = constraint
+            if constraint not in constraints:
+                constraints.append(constraint)
+            if known is not None:
+                if child not in known:
+                    known.add(child)
+                    siblings.append(child)
+            elif child not in siblings:
+                siblings.append(child)
+                if len(siblings) > SIBLINGS_SCANNED:
+                    known = self.siblings[modelType][parent] = set(siblings)
+        parentNode.children = siblings
+        self.relations[modelType].append((parentNode, constraint, children))
+
+    def finalize(self, modelType):
+        """
+        Sets the parent of the nodes never listed as a child and computes the depth of every
+        node of modelType from its root.
+        """
+        root = ROOTS[modelType]
+        nodes = self.nodesOf(modelType)
+        for node in nodes.values():
+            if node.name not in self.memberships[modelType]:
+                node.parent = root
+        for name in nodes:
+            if name == root or name not in self.memberships[modelType]:
+                self.setDepth(name, 0 if name == root else 1, modelType)
+
+    def setDepth(self, name, depth, modelType):
+        """
+        Sets the depth of name and of its descendants, iteratively to support deep models.
+        """
+        nodes = self.nodesOf(modelType)
+        stack = [(name, depth)]
+        visited = set()
+        while stack:
+            current, currentDepth = stack.pop()
+            if current in visited:
+                continue
+            visited.add(current)
+            nodes[current].depth = currentDepth
+            for child in self.getChildren(current, modelType):
+                stack.append((child, currentDepth + 1))
+
+    # ---------------------------
+    # --------- LOOKUPS ---------
+    # ---------------------------
+
+    def getRelations(self, name, modelType):
+        """
+        Returns the list of (constraint, children) relationships name takes part in: the ones where
+        it is listed as a child (with no children) followed by the ones where it is the parent.
+        """
+        node = self.getNode(name, modelType)
+        if node is None:
+            return []
+        relations = [(constraint, ()) for constraint in self.memberships[modelType].get(name, [])]
+        return relations + node.groups
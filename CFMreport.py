@@ -0,0 +1,168 @@
+# Author: Audric Deckers
+import csv
+import json
+import os
+import queue
+import threading
+from CFMcache import temporaryFile, publish
+
+# Sinks of the mutation report: no report, the text log (mutations.txt), one JSON record per line or a CSV table.
+SINKS = ["none", "text", "ndjson", "csv"]
+
+# Usual extension of the file of each sink (cfr. batch.py).
+EXTENSIONS = {"text": ".txt", "ndjson": ".ndjson", "csv": ".csv"}
+
+# Columns of the CSV sink, shared by the three kinds of records (pair, mutation and total), empty when not relevant.
+CSV_FIELDS = ["record", "pair", "operator", "side", "parentContext", "constraintContext", "childrenContext",
+              "parentFeature", "constraintFeature", "childrenFeature", "mutants", "question", "mutation", "answer",
+              "signature"]
+
+def pairRecord(index, connectedPair, mutants):
+    """
+    Returns the record of the connected pair index, processed with mutants mutations (cfr. CFMmodel.streamMutants).
+    """
+    return {"record": "pair", "pair": index,
+            "parentContext": connectedPair.parentContext, "constraintContext": connectedPair.constraintContext,
+            "childrenContext": list(connectedPair.childrenContext),
+            "parentFeature": connectedPair.parentFeature, "constraintFeature": connectedPair.constraintFeature,
+            "childrenFeature": list(connectedPair.childrenFeature), "mutants": mutants}
+
+def mutationRecord(index, operator, mutant, question):
+    """
+    Returns the record of the mutation of the connected pair index by operator, giving mutant and question.
+    """
+    return {"record": "mutation", "pair": index, "operator": operator.name, "side": operator.side,
+            "parentContext": mutant.parentContext, "constraintContext": mutant.constraintContext,
+            "parentFeature": mutant.parentFeature, "constraintFeature": mutant.constraintFeature,
+            "question": question['question'], "mutation": question['mutation'], "answer": question['answer'],
+            "signature": question['signature']}
+
+def totalRecord(pairs, mutants):
+    """
+    Returns the record closing the report, with the number of connected pairs processed and the total of mutants of
+    the text log.
+    """
+    return {"record": "total", "pair": pairs, "mutants": mutants}
+
+def csvRow(record):
+    row = dict(record)
+    for field in ["childrenContext", "childrenFeature"]:
+        if field in row:
+            row[field] = "-".join(row[field])
+    if "answer" in row:
+        row["answer"] = "/".join(row["answer"])
+    if "signature" in row:
+        row["signature"] = json.dumps(row["signature"])
+    return row
+
+class CFMReport:
+    """
+    Writer of the mutation report of a model to path, in the given sink (cfr. SINKS). The text sink receives the
+    lines of the text log, the ndjson and csv sinks the records (cfr. pairRecord, mutationRecord and totalRecord), which
+    carry the same information. Records are buffered by bufferSize and, when background is set, encoded and written by
+    a thread so that the generation of the mutants does not wait for the disk. The report is written to a temporary
+    file moved to path once closed, so that concurrent runs never interleave their lines nor leave a partial report.
+    """
+    def __init__(self, path, sink="text", background=False, bufferSize=4096):
+        if sink not in SINKS:
+            raise ValueError("Please, choose a report sink among: " + ", ".join(SINKS) + ".")
+        if path is None:
+            sink = "none"
+        self.path = path
+        self.sink = sink
+        self.bufferSize = bufferSize
+        self.buffer = []
+        self.file = None
+        self.thread = None
+        self.failure = None
+        # Callable receiving the records, None for the sinks written from the text log.
+        self.record = self.add if sink in ["ndjson", "csv"] else None
+        if sink == "none":
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file, self.temporary = temporaryFile(path, "w", newline="" if sink == "csv" else None)
+        if sink == "csv":
+            self.csv = csv.DictWriter(self.file, CSV_FIELDS, extrasaction="ignore")
+            self.csv.writeheader()
+        if background:
+            self.chunks = queue.Queue(maxsize=64)
+            self.thread = threading.Thread(target=self.drain, daemon=True)
+            self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, error, trace):
+        self.close(error is None)
+
+    # ---------------------------
+    # --------- WRITING ---------
+    # ---------------------------
+
+    def add(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def lines(self, lines):
+        """
+        Writes the lines of the text log, for the text sink only.
+        """
+        if self.sink == "text":
+            self.buffer.extend(lines)
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        chunk, self.buffer = self.buffer, []
+        if self.thread is not None:
+            self.chunks.put(chunk)
+        else:
+            self.writeChunk(chunk)
+
+    def writeChunk(self, chunk):
+        if self.sink == "ndjson":
+            self.file.write("".join(json.dumps(record) + "\n" for record in chunk))
+        elif self.sink == "csv":
+            self.csv.writerows(csvRow(record) for record in chunk)
+        elif self.sink == "text":
+            self.file.writelines(chunk)
+
+    def drain(self):
+        """
+        Writes the chunks of the queue until the None closing it (background thread). After an error, the chunks
+        are dropped and the error is raised again by close.
+        """
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            if self.failure is None:
+                try:
+                    self.writeChunk(chunk)
+                except Exception as error:
+                    self.failure = error
+
+    def close(self, complete=True):
+        """
+        Writes the remaining records and moves the report to its path, or drops it if complete is False.
+        """
+        if self.file is None:
+            return
+        if complete:
+            self.flush()
+        if self.thread is not None:
+            self.chunks.put(None)
+            self.thread.join()
+            self.thread = None
+        self.file.close()
+        self.file = None
+        if self.failure is not None:
+            os.remove(self.temporary)
+            raise self.failure
+        if complete:
+            publish(self.temporary, self.path)
+        else:
+            os.remove(self.temporary)
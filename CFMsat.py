@@ -0,0 +1,267 @@
+# Author: Audric Deckers
+
+class CFMSolver:
+    """
+    Small conflict-driven clause learning SAT solver for the configuration constraints of a CFM model.
+
+    Variables are numbered from 0 and a literal is 2 * variable for the variable true, 2 * variable + 1 for it false.
+    Unassigned variables default to false: the search stops as soon as setting every unassigned variable to false
+    satisfies all the clauses, so that only the active part of a configuration is ever assigned. Clauses can be
+    added between calls to solve(), and solve() accepts assumption literals.
+    """
+    def __init__(self, nbrVariables=0):
+        self.value = []       # Variable -> 1 (true), 0 (false) or -1 (unassigned).
+        self.level = []       # Variable -> decision level of its assignment.
+        self.reason = []      # Variable -> index of the clause that implied it, None for decisions.
+        self.activity = []    # Variable -> activity, bumped when the variable takes part in a conflict.
+        self.watches = []     # Literal -> indexes of the clauses watching it.
+        self.negative = []    # Variable -> indexes of the (original) clauses where it occurs false.
+        self.positive = []    # Indexes of the original clauses without any false literal.
+        self.clauses = []
+        self.trail = []
+        self.limits = []      # Trail length at the start of each decision level.
+        self.head = 0         # Trail position of the next assignment to propagate.
+        self.checked = 0      # Trail position up to which the default completion has been checked.
+        self.increment = 1.0
+        self.ok = True
+        for i in range(nbrVariables):
+            self.newVariable()
+
+    def newVariable(self):
+        self.value.append(-1)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.watches.extend([[], []])
+        self.negative.append([])
+        return len(self.value) - 1
+
+    def litValue(self, literal):
+        """
+        Returns 1 if literal is true, 0 if it is false, -1 if its variable is unassigned.
+        """
+        value = self.value[literal >> 1]
+        return value if value < 0 else value ^ (literal & 1)
+
+    # ---------------------------
+    # --------- CLAUSES ---------
+    # ---------------------------
+
+    def addClause(self, literals):
+        """
+        Adds the disjunction of literals. Returns False if the clauses became unsatisfiable.
+        """
+        self.backtrack(0)
+        if not self.ok:
+            return False
+        clause = []
+        for literal in dict.fromkeys(literals):
+            value = self.litValue(literal)
+            if value == 1 or literal ^ 1 in clause:
+                return True
+            if value == -1:
+                clause.append(literal)
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        # The completion check looks at the original literals, assigned ones included.
+        negatives = [literal >> 1 for literal in literals if literal & 1]
+        for var in negatives:
+            self.negative[var].append(index)
+        if not negatives:
+            self.positive.append(index)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watches[clause[0]].append(index)
+            self.watches[clause[1]].append(index)
+        return self.ok
+
+    # ---------------------------
+    # ------- PROPAGATION -------
+    # ---------------------------
+
+    def enqueue(self, literal, reason):
+        var = literal >> 1
+        self.value[var] = 1 - (literal & 1)
+        self.level[var] = len(self.limits)
+        self.reason[var] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagates the assignments of the trail, returns the index of a conflicting clause or None.
+        """
+        clauses, watches, value = self.clauses, self.watches, self.value
+        while self.head < len(self.trail):
+            falseLiteral = self.trail[self.head] ^ 1
+            self.head += 1
+            watching = watches[falseLiteral]
+            kept = []
+            for position, index in enumerate(watching):
+                clause = clauses[index]
+                if clause[0] == falseLiteral:
+                    clause[0], clause[1] = clause[1], falseLiteral
+                first = clause[0]
+                firstValue = value[first >> 1]
+                if firstValue >= 0 and firstValue ^ (first & 1) == 1:
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    other = clause[k]
+                    otherValue = value[other >> 1]
+                    if otherValue < 0 or otherValue ^ (other & 1) == 1:
+                        clause[1], clause[k] = other, falseLiteral
+                        watches[other].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if firstValue >= 0:
+                        kept.extend(watching[position + 1:])
+                        watches[falseLiteral] = kept
+                        return index
+                    self.enqueue(first, index)
+            watches[falseLiteral] = kept
+        return None
+
+    def backtrack(self, level):
+        if len(self.limits) <= level:
+            return
+        limit = self.limits[level]
+        for literal in self.trail[limit:]:
+            self.value[literal >> 1] = -1
+        del self.trail[limit:]
+        del self.limits[level:]
+        self.head = min(self.head, limit)
+        self.checked = 0
+
+    # ---------------------------
+    # --------- SEARCH ----------
+    # ---------------------------
+
+    def analyze(self, conflict):
+        """
+        Returns the first-UIP clause learnt from the conflicting clause and the level to backtrack to.
+        """
+        seen = set()
+        learnt = [None]
+        pending = 0
+        literal = None
+        position = len(self.trail) - 1
+        current = len(self.limits)
+        clause = self.clauses[conflict]
+        while True:
+            for other in clause:
+                var = other >> 1
+                if other == literal or var in seen or self.level[var] == 0:
+                    continue
+                seen.add(var)
+                self.bump(var)
+                if self.level[var] == current:
+                    pending += 1
+                else:
+                    learnt.append(other)
+            while self.trail[position] >> 1 not in seen:
+                position -= 1
+            literal = self.trail[position]
+            position -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reason[literal >> 1]]
+        learnt[0] = literal ^ 1
+        if len(learnt) == 1:
+            return learnt, 0
+        highest = max(range(1, len(learnt)), key=lambda i: self.level[learnt[i] >> 1])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, self.level[learnt[1] >> 1]
+
+    def bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+
+    def violated(self):
+        """
+        Returns a clause falsified when every unassigned variable is set to false, None if there is none.
+        """
+        value = self.value
+        def falsified(clause):
+            for literal in clause:
+                v = value[literal >> 1]
+                if (v == 1) != (literal & 1):
+                    return False
+            return True
+        for index in self.positive:
+            if falsified(self.clauses[index]):
+                return index
+        while self.checked < len(self.trail):
+            literal = self.trail[self.checked]
+            if not literal & 1:
+                for index in self.negative[literal >> 1]:
+                    if falsified(self.clauses[index]):
+                        return index
+            self.checked += 1
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns whether the clauses are satisfiable with the assumption literals true.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        conflicts, restart, luby = 0, 100, lubySequence()
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                index = len(self.clauses)
+                self.clauses.append(learnt)
+                if len(learnt) > 1:
+                    self.watches[learnt[0]].append(index)
+                    self.watches[learnt[1]].append(index)
+                self.enqueue(learnt[0], index)
+                self.increment *= 1.05
+                conflicts += 1
+                if conflicts >= restart:
+                    conflicts, restart = 0, 100 * next(luby)
+                    self.backtrack(0)
+                continue
+
+            if len(self.limits) < len(assumptions):
+                literal = assumptions[len(self.limits)]
+                value = self.litValue(literal)
+                if value == 0:
+                    self.backtrack(0)
+                    return False
+                self.limits.append(len(self.trail))
+                if value == -1:
+                    self.enqueue(literal, None)
+                continue
+
+            index = self.violated()
+            if index is None:
+                self.backtrack(0)
+                return True
+            # Activate the most active of the unassigned variables of the falsified clause.
+            literal = max((literal for literal in self.clauses[index] if self.value[literal >> 1] < 0),
+                          key=lambda literal: self.activity[literal >> 1])
+            self.limits.append(len(self.trail))
+            self.enqueue(literal, None)
+
+def lubySequence():
+    """
+    Yields the Luby sequence 1, 1, 2, 1, 1, 2, 4, ... used to space restarts.
+    """
+    u, v = 1, 1
+    while True:
+        yield v
+        u, v = (u + 1, 1) if u & -u == v else (u, 2 * v)
@@ -0,0 +1,503 @@
+# Author: Audric Deckers
+from CFMbdd import *
+from CFMnode import *
+from CFMsat import *
+from CFMoracle import CFMResult
+
+def constraintParts(constraint, group, children):
+    """
+    Returns the atomic constraints of a relationship: 'alo' (the parent needs at least one child), 'amo' (at most
+    one child) and ('man', child) (the parent needs child), each tagged with the group index.
+    """
+    if constraint == "Alternative":
+        return {("alo", group), ("amo", group)}
+    if constraint == "Or":
+        return {("alo", group)}
+    if constraint == "Mandatory":
+        return {("man", group, child) for child in children}
+    return set()
+
+def substituteRoots(constraint):
+    """
+    Returns the constraints equivalent to a (literals, variables) constraint once the roots, active in every
+    configuration, are replaced by true.
+    """
+    roots = set(ROOTS.items())
+    literals, variables = constraint
+    if any(key in roots and polarity for key, polarity in literals):
+        return []
+    literals = [(key, polarity) for key, polarity in literals if key not in roots]
+    if any(key in roots for key in variables):
+        # At most one of the variables, a root being one of them: the others are false.
+        return [(literals + [(key, False)], []) for key in variables if key not in roots]
+    return [(literals, variables)]
+
+class CFMComponent:
+    """
+    Constraints of a model sharing variables, the order of the keys giving their variable numbers. Its
+    configurations are counted with a decision diagram as long as it stays under maxNodes nodes, otherwise (or when
+    search is set) the component is searched with the SAT solver.
+    """
+    def __init__(self, constraints, order, maxNodes=None, search=False):
+        self.variables = {key: var for var, key in enumerate(order)}
+        self.selectors = {key[1]: var for key, var in self.variables.items() if key[0] == "selector"}
+        self.bdd, self.root, self.solver = None, None, None
+        self.negations = {}
+        try:
+            if search:
+                raise CFMBddOverflow("Searched component.")
+            self.bdd = CFMBdd(len(order), maxNodes)
+            functions = []
+            for literals, amo in constraints:
+                f = self.bdd.clause([(self.variables[key], polarity) for key, polarity in literals])
+                if amo:
+                    f = self.bdd.apply("or", f, self.bdd.atMostOne([self.variables[key] for key in amo]))
+                functions.append(f)
+            self.root = self.bdd.conjoin(functions)
+            # Only the final diagram is needed from now on.
+            self.bdd.unique.clear()
+            self.bdd.computed.clear()
+        except CFMBddOverflow:
+            self.bdd = None
+            self.solver = CFMSolver(len(order))
+            for literals, amo in constraints:
+                clause = [self.literal(key, polarity) for key, polarity in literals]
+                if not amo:
+                    self.solver.addClause(clause)
+                for i, first in enumerate(amo):
+                    for second in amo[i + 1:]:
+                        self.solver.addClause(clause + [self.literal(first, False), self.literal(second, False)])
+
+    def literal(self, key, polarity):
+        return 2 * self.variables[key] + (0 if polarity else 1)
+
+    # ---------------------------
+    # --------- COUNTING --------
+    # ---------------------------
+
+    def count(self, active=()):
+        """
+        Returns the number of configurations with the selectors in active set and the others unset, and the
+        derivatives giving, for each variable of a selector, the number of configurations once it is set as well.
+        """
+        weights = [(1, 1)] * len(self.variables)
+        for selector, var in self.selectors.items():
+            weights[var] = (0, 1) if selector in active else (1, 0)
+        return self.bdd.count(self.root, weights)
+
+    # ---------------------------
+    # --------- SEARCH ----------
+    # ---------------------------
+
+    def assumptions(self, active=()):
+        return [2 * var + (0 if selector in active else 1) for selector, var in self.selectors.items()]
+
+    def satisfiable(self, active=()):
+        """
+        Returns whether a configuration exists with the selectors in active set and the others unset.
+        """
+        if self.bdd is not None:
+            return self.count(active)[0] != 0
+        return self.solver.solve(self.assumptions(active))
+
+    def negate(self, part, constraints):
+        """
+        Returns the solver variable implying the constraints (whose conjunction violates part), created on first use.
+        """
+        if part not in self.negations:
+            var = self.solver.newVariable()
+            for literals, variables in constraints:
+                self.solver.addClause([2 * var + 1] + [self.literal(key, polarity) for key, polarity in literals])
+            self.negations[part] = var
+        return self.negations[part]
+
+    def escapes(self, active, parts):
+        """
+        Returns whether a configuration with the selectors in active set violates one of the atomic constraints of
+        parts, given as (part, constraints violating it) couples.
+        """
+        activation = self.solver.newVariable()
+        negations = [self.negate(part, constraints) for part, constraints in parts]
+        self.solver.addClause([2 * activation + 1] + [2 * var for var in negations])
+        result = self.solver.solve(self.assumptions(active) + [2 * activation])
+        # The clause is disabled for good.
+        self.solver.addClause([2 * activation + 1])
+        return result
+
+class CFMConfigurationSpace:
+    """
+    Configuration space of a CFM model. A configuration is a set of active contexts and features such that:
+    - the Context and Feature roots are active, and an active child has its parent active;
+    - an active parent has every Mandatory child active, at least one child of an Or relationship and exactly one
+      child of an Alternative relationship active;
+    - the features activated by a line of the mapping are active when all the contexts of the line are.
+
+    Each mutant changes the constraint of at most one context relationship and one feature relationship. Every
+    distinct change is guarded by a selector variable and the constraints are split into independent components,
+    each compiled into a binary decision diagram: the number of configurations of all the mutants is then obtained
+    from a few weighted counting passes instead of one compilation per mutant. A mutant is equivalent when it keeps
+    the number (hence, when its changes only relax or only restrict the constraints, the set) of valid
+    configurations. A component whose diagram would exceed maxNodes nodes, or whose mutant both relaxes and restricts
+    constraints (e.g. ManToAlt), is searched with a SAT solver instead: a mutant is equivalent when no configuration is
+    valid for the mutant but not for the model, nor the reverse.
+    """
+    def __init__(self, model, maxNodes=500000):
+        self.model = model
+        self.maxNodes = maxNodes
+        self.groups = {modelType: self.relationships(modelType) for modelType in ROOTS}
+
+        # Mutants with their connected pair and the changes they apply on each side.
+        self.items = []
+        self.selectors = {}
+        for connectedPair in model.iterConnectedPairs():
+            for mutant, question in model.streamMutants([connectedPair], counted=False):
+                changes = [self.change("contexts", connectedPair.parentContext, connectedPair.constraintContext,
+                                       connectedPair.childrenContext, mutant.constraintContext),
+                           self.change("features", connectedPair.parentFeature, connectedPair.constraintFeature,
+                                       connectedPair.childrenFeature, mutant.constraintFeature)]
+                changes = [self.selectors.setdefault(change, len(self.selectors)) for change in changes if change]
+                self.items.append((mutant, question, changes))
+        self.changes = {selector: change for change, selector in self.selectors.items()}
+
+        self.compile()
+        self.decide()
+
+    # ---------------------------
+    # --------- HELPERS ---------
+    # -------- FUNCTIONS --------
+    # ---------------------------
+
+    def relationships(self, modelType):
+        """
+        Returns the (parent, constraint, children) relationships of modelType, without duplicated children.
+        """
+        return [(node.name, constraint, tuple(dict.fromkeys(children)))
+                for node, constraint, children in self.model.registry.relations[modelType]]
+
+    def change(self, modelType, parent, constraint, children, newConstraint):
+        """
+        Returns the (modelType, atomic constraints added or removed) change made by modifying the constraint of
+        parent (or of its relationship with children) from constraint to newConstraint, None if nothing changes.
+        """
+        if constraint == newConstraint:
+            return None
+        for group, (name, groupConstraint, groupChildren) in enumerate(self.groups[modelType]):
+            if groupConstraint != constraint:
+                continue
+            if children and name == parent and groupChildren == tuple(dict.fromkeys(children)):
+                # The relationship of parent with its children.
+                changed = groupChildren
+            elif not children and parent in groupChildren:
+                # The constraint parent has as a child: Mandatory and Optional only concern parent itself.
+                changed = (parent,)
+            else:
+                continue
+            parts = constraintParts(constraint, group, changed) ^ constraintParts(newConstraint, group, changed)
+            return (modelType, frozenset(parts)) if parts else None
+        return None
+
+    def mapping(self):
+        """
+        Returns the (contexts, features) lines of the mapping.
+        """
+        return [(list(contexts), list(features)) for contexts, features in self.model.mapping.lines]
+
+    def negation(self, modelType, part):
+        """
+        Returns the constraints whose conjunction violates the atomic constraint part of modelType.
+        """
+        parent, constraint, children = self.groups[modelType][part[1]]
+        p = (modelType, parent)
+        cs = [(modelType, child) for child in children]
+        if part[0] == "alo":
+            clauses = [[(p, True)]] + [[(c, False)] for c in cs]
+        elif part[0] == "amo":
+            # Two children at least: whichever child is left out, another one is active.
+            clauses = [[(c, True) for c in cs if c != left] for left in cs] if len(cs) > 1 else [[]]
+        else:
+            clauses = [[(p, True)], [((modelType, part[2]), False)]]
+        return [constraint for literals in clauses for constraint in substituteRoots((literals, []))]
+
+    # ---------------------------
+    # ------- COMPILATION -------
+    # ---------------------------
+
+    def order(self, modelType):
+        """
+        Returns the nodes of modelType in depth-first order from the root, followed by the subtrees of the nodes
+        never listed as a child, so that a parent and its children are close in the diagram.
+        """
+        registry = self.model.registry
+        root = ROOTS[modelType]
+        names = list(registry.nodesOf(modelType))
+        starts = [root] + [name for name in names if name not in registry.memberships[modelType] and name != root]
+        order = {}
+        for start in starts + names:
+            stack = [start]
+            while stack:
+                name = stack.pop()
+                if name in order:
+                    continue
+                order[name] = len(order)
+                stack.extend(reversed(registry.getChildren(name, modelType)))
+        return list(order)
+
+    def constraints(self):
+        """
+        Returns the constraints of the model as (literals, variables) couples, satisfied when one of the
+        (variable, polarity) literals holds or when at most one of the variables is true (if there are any).
+        The atomic constraints changed by the mutants are guarded by their selector variables, and self.original
+        records the atomic constraints of the model itself.
+        """
+        guards = {}
+        for (modelType, parts), selector in self.selectors.items():
+            for part in parts:
+                guards.setdefault((modelType, part), []).append(("selector", selector))
+
+        constraints = []
+        self.original = set()
+        for modelType in ROOTS:
+            for group, (parent, constraint, children) in enumerate(self.groups[modelType]):
+                p = (modelType, parent)
+                cs = [(modelType, child) for child in children]
+                for c in cs:
+                    constraints.append(([(c, False), (p, True)], []))
+                original = constraintParts(constraint, group, children)
+                self.original.update((modelType, part) for part in original)
+                for part in [("alo", group), ("amo", group)] + [("man", group, child) for child in children]:
+                    if part[0] == "alo":
+                        literals, variables = [(p, False)] + [(c, True) for c in cs], []
+                    elif part[0] == "amo":
+                        literals, variables = [], cs
+                    else:
+                        literals, variables = [(p, False), ((modelType, part[2]), True)], []
+                    selectors = guards.get((modelType, part), [])
+                    if part in original:
+                        # Enforced unless a selector removing it is set.
+                        constraints.append(([(s, True) for s in selectors] + literals, variables))
+                    else:
+                        # Enforced by each selector adding it.
+                        for s in selectors:
+                            constraints.append(([(s, False)] + literals, variables))
+        for contexts, features in self.mapping():
+            for feature in features:
+                constraints.append(([(("contexts", c), False) for c in contexts] + [(("features", feature), True)], []))
+        return [substituted for constraint in constraints for substituted in substituteRoots(constraint)]
+
+    def components(self, constraints):
+        """
+        Returns the constraints grouped by connected components (constraints sharing variables), whose
+        configurations are independent, as lists of (keys, constraint) couples.
+        """
+        parents = {}
+        def find(key):
+            parents.setdefault(key, key)
+            while parents[key] != key:
+                parents[key] = parents[parents[key]]
+                key = parents[key]
+            return key
+
+        keyed = []
+        for literals, variables in constraints:
+            keys = [key for key, polarity in literals] + list(variables)
+            for key in keys[1:]:
+                parents[find(key)] = find(keys[0])
+            keyed.append((keys, (literals, variables)))
+        components = {}
+        for keys, constraint in keyed:
+            if not keys:
+                # Empty clause: no configuration at all.
+                self.unsatisfiable = True
+                continue
+            components.setdefault(find(keys[0]), []).append((keys, constraint))
+        return list(components.values())
+
+    def initialPositions(self):
+        """
+        Returns the position of each variable in the depth-first order of both trees, each selector being placed
+        right after the last node it depends on.
+        """
+        positions = {}
+        for modelType in ROOTS:
+            for name in self.order(modelType):
+                positions[(modelType, name)] = (len(positions), -1)
+        for (modelType, parts), selector in self.selectors.items():
+            last = 0
+            for part in parts:
+                parent, constraint, children = self.groups[modelType][part[1]]
+                names = [parent] + ([part[2]] if part[0] == "man" else list(children))
+                last = max([last] + [positions[(modelType, name)][0] for name in names])
+            positions[("selector", selector)] = (last, selector)
+        return positions
+
+    def variableOrder(self, keys, edges, iterations=100):
+        """
+        Returns the order of keys in the diagram. Starting from their initial order, variables are repeatedly moved
+        to the center of gravity of the constraints they take part in (FORCE heuristic), which brings the features
+        close to the contexts activating them; the order with the smallest total span of the constraints is kept.
+        """
+        order = list(keys)
+        incidence = {key: [] for key in order}
+        for i, edge in enumerate(edges):
+            for key in edge:
+                incidence[key].append(i)
+        best, bestSpan = order, None
+        for iteration in range(iterations):
+            position = {key: i for i, key in enumerate(order)}
+            span = sum(max(position[key] for key in edge) - min(position[key] for key in edge) for edge in edges)
+            if bestSpan is None or span < bestSpan:
+                best, bestSpan = order, span
+            gravity = [sum(position[key] for key in edge) / len(edge) for edge in edges]
+            moved = sorted(order, key=lambda key: (sum(gravity[i] for i in incidence[key]) / len(incidence[key]),
+                                                   position[key]))
+            if moved == order:
+                break
+            order = moved
+        return best
+
+    def compile(self):
+        """
+        Builds the CFMComponent of each component of the model (self.compiled), and records the component of each
+        selector (self.where) and the number of nodes constrained by nothing (self.free), each doubling the number
+        of configurations.
+        """
+        self.unsatisfiable = False
+        constraints = self.constraints()
+        positions = self.initialPositions()
+        self.compiled = []
+        # Constraints and order of each component, to search it when counting is not enough (cfr. searcher).
+        self.sources = []
+        self.searchers = {}
+        self.where = {}
+        constrained = set()
+        for component in self.components(constraints):
+            keys = sorted({key for keys, constraint in component for key in keys}, key=positions.get)
+            constrained.update(keys)
+            order = self.variableOrder(keys, [set(keys) for keys, constraint in component])
+            compiled = CFMComponent([constraint for keys, constraint in component], order, self.maxNodes)
+            self.sources.append(([constraint for keys, constraint in component], order))
+            for selector in compiled.selectors:
+                self.where[selector] = len(self.compiled)
+            self.compiled.append(compiled)
+        roots = set(ROOTS.items())
+        self.free = sum(1 for key in positions if key[0] != "selector" and key not in roots and key not in constrained)
+
+    # ---------------------------
+    # -------- DECISION ---------
+    # ---------------------------
+
+    def searcher(self, k):
+        """
+        Returns the component k searched with the SAT solver, built on first use.
+        """
+        if self.compiled[k].solver is not None:
+            return self.compiled[k]
+        if k not in self.searchers:
+            constraints, order = self.sources[k]
+            self.searchers[k] = CFMComponent(constraints, order, search=True)
+        return self.searchers[k]
+
+    def same(self, component, active, removed, added):
+        """
+        Returns whether the selectors in active keep the configurations of the searched component: no configuration
+        of the mutant violates a removed atomic constraint and no configuration of the model violates an added one.
+        """
+        return not (removed and component.escapes(active, [(part, self.negation(*part)) for part in removed])) and \
+               not (added and component.escapes((), [(part, self.negation(*part)) for part in added]))
+
+    def decide(self):
+        """
+        Sets self.equivalent, telling for each mutant (key = index of the mutant) whether it keeps the set of valid
+        configurations, and self.counts, the number of valid configurations of the model (key None) and of each
+        mutant, all None if a component is searched. A mutant only replaces the components of its changes: the
+        derivatives of the first counting pass give the ones changing a single relationship of a component, one more
+        pass per distinct change gives the ones changing two relationships of the same component.
+        """
+        passes = {k: component.count() for k, component in enumerate(self.compiled) if component.bdd is not None}
+        counted = len(passes) == len(self.compiled)
+        empty = [passes[k][0] == 0 if k in passes else not component.satisfiable()
+                 for k, component in enumerate(self.compiled)]
+        originalEmpty = self.unsatisfiable or any(empty)
+        factor = 0 if self.unsatisfiable else 1 << self.free
+
+        products = {}
+        def others(*excluded):
+            # Number of configurations of the components not in excluded.
+            if excluded not in products:
+                product = factor
+                for k, (total, derivatives) in passes.items():
+                    if k not in excluded:
+                        product *= total
+                products[excluded] = product
+            return products[excluded]
+
+        jointPasses = {}
+        slices = {}
+        def decideSlice(k, active):
+            # (number of configurations, same configurations, no configuration) of component k, active set.
+            if (k, active) in slices:
+                return slices[(k, active)]
+            component = self.compiled[k]
+            parts = [(self.changes[selector][0], part) for selector in active for part in self.changes[selector][1]]
+            removed = [part for part in parts if part in self.original]
+            added = [part for part in parts if part not in self.original]
+            if component.bdd is not None:
+                if len(active) == 1:
+                    derivatives = passes[k][1]
+                else:
+                    if active[0] not in jointPasses:
+                        jointPasses[active[0]] = component.count(active[:1])
+                    derivatives = jointPasses[active[0]][1]
+                count = derivatives[component.selectors[active[-1]]]
+                same = count == passes[k][0]
+                if same and removed and added:
+                    # Relaxed and restricted at once: the same number of configurations may be other ones.
+                    same = self.same(self.searcher(k), active, removed, added)
+                slices[(k, active)] = (count, same, count == 0)
+            else:
+                slices[(k, active)] = (None, self.same(component, active, removed, added),
+                                       not component.satisfiable(active))
+            return slices[(k, active)]
+
+        self.counts = {None: others() if counted else None}
+        self.equivalent = {}
+        for index, (mutant, question, changes) in enumerate(self.items):
+            touched = {}
+            for selector in changes:
+                touched.setdefault(self.where[selector], []).append(selector)
+            decided = {k: decideSlice(k, tuple(active)) for k, active in touched.items()}
+            if originalEmpty:
+                # The mutant has no configuration either if an untouched component has none, or if it empties one.
+                self.equivalent[index] = self.unsatisfiable or \
+                    any(empty[k] for k in range(len(empty)) if k not in touched) or \
+                    any(isEmpty for count, same, isEmpty in decided.values())
+            else:
+                self.equivalent[index] = all(same for count, same, isEmpty in decided.values())
+            count = None
+            if counted:
+                count = others(*sorted(touched))
+                for sliceCount, same, isEmpty in decided.values():
+                    count *= sliceCount
+            self.counts[index] = count
+
+    def count(self):
+        """
+        Returns the number of valid configurations of the model, None if a component is too large to be counted.
+        """
+        return self.counts[None]
+
+    def isEquivalent(self, index):
+        return self.equivalent[index]
+
+    def evaluate(self):
+        """
+        Returns the CFMResult of the mutants without any question: a mutant is killed when it changes the set of valid
+        configurations, the equivalent mutants are the surviving ones.
+        """
+        result = CFMResult()
+        for index, (mutant, question, changes) in enumerate(self.items):
+            if self.isEquivalent(index):
+                result.surviving.append((mutant, question))
+            else:
+                result.killed.append((mutant, question))
+        return result
@@ -0,0 +1,271 @@
+# Author: Audric Deckers
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from CFMmodel import *
+
+class CFMRequestError(Exception):
+    """
+    Error answered to the client with status and a JSON body {"error": message, ...details}.
+    """
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+class CFMSession:
+    """
+    Loaded model kept by the service: the model with its connected pairs and mutants, its questions (one per
+    signature, cfr. groupMutants) and the answers submitted so far, by question index (starting at 1).
+    """
+    def __init__(self, key, model, store=None):
+        self.key = key
+        self.model = model
+        self.groups = groupMutants(model.iterMutants())
+        self.answers = {}
+        self.store = store
+
+    def restore(self):
+        """
+        Takes the answers already given for this model from the answer store, if any (cfr. CFManswers.py).
+        """
+        if self.store is None:
+            return
+        for index, (question, mutants) in enumerate(self.groups, 1):
+            answer = self.store.get(self.model.identity(), question)
+            if answer is not None:
+                self.answers[index] = answer
+
+    def summary(self):
+        model = self.model
+        return {"model": self.key, "contexts": len(model.contexts), "features": len(model.features),
+                "connectedPairs": len(model.connectedPairs), "mutants": len(model.mutants),
+                "questions": len(self.groups), "answered": len(self.answers)}
+
+    def answer(self, index, answer):
+        """
+        Records the answer to the question index and returns whether its mutants survive.
+        """
+        if not isinstance(index, int) or not 1 <= index <= len(self.groups):
+            raise CFMRequestError(HTTPStatus.BAD_REQUEST, "Unknown question " + str(index) + ".")
+        normalised = normalise(answer)
+        if normalised is None:
+            raise CFMRequestError(HTTPStatus.BAD_REQUEST, "Invalid answer, accepted answers are yes, y, no and n.")
+        question = self.groups[index - 1][0]
+        self.answers[index] = normalised
+        if self.store is not None:
+            self.store.put(self.model.identity(), question, normalised)
+        return normalised in question['answer']
+
+    def result(self):
+        """
+        Returns the CFMResult of the answered questions (the mutants of unanswered questions are left out).
+        """
+        answered = {self.groups[index - 1][0]['signature']: answer for index, answer in self.answers.items()}
+        items = [item for item in self.model.iterMutants() if item[1]['signature'] in answered]
+        return evaluate(items, CFMCallableOracle(lambda question, mutant: answered[question['signature']]))
+
+class CFMService:
+    """
+    Local analysis service: keeps up to maxModels models (with their mutants) in memory, least recently used first
+    out, keyed by the hash of the contents of their files (cfr. contentKey), and answers JSON requests over HTTP on a
+    TCP port or a Unix socket. Models are built in worker threads, a model requested by several clients at once
+    being built once, so that the requests on the models already loaded are served meanwhile.
+    """
+    def __init__(self, maxModels=8, store=None, engine="python"):
+        self.maxModels = maxModels
+        self.store = store
+        self.engine = engine
+        self.sessions = OrderedDict()
+        self.loading = {}
+
+    # ---------------------------
+    # --------- MODELS ----------
+    # ---------------------------
+
+    def files(self, request):
+        """
+        Returns the files of the model described by request: a directory, the three files or a compiled model.
+        """
+        if "compiled" in request:
+            return {"compiled": request["compiled"]}, [request["compiled"]]
+        if "directory" in request:
+            files = [os.path.join(request["directory"], name) for name in MODEL_FILES]
+        elif all(name in request for name in ["contexts", "features", "mapping"]):
+            files = [request["contexts"], request["features"], request["mapping"]]
+        else:
+            raise CFMRequestError(HTTPStatus.BAD_REQUEST, "Please, provide a directory, the contexts, features and "
+                                  "mapping files or a compiled model.")
+        return {"contextsFile": files[0], "featuresFile": files[1], "mappingFile": files[2]}, files
+
+    async def load(self, request):
+        """
+        Returns the session of the model described by request, built (in a worker thread) unless it is loaded.
+        """
+        arguments, files = self.files(request)
+        compact = bool(request.get("compact", False))
+        loop = asyncio.get_running_loop()
+        try:
+            key = await loop.run_in_executor(None, contentKey, files, "compact" if compact else "")
+        except OSError as error:
+            raise CFMRequestError(HTTPStatus.NOT_FOUND, str(error))
+        if key in self.sessions:
+            self.sessions.move_to_end(key)
+            return self.sessions[key], True
+        if key not in self.loading:
+            self.loading[key] = loop.run_in_executor(None, self.build, key, arguments, compact)
+        try:
+            session = await self.loading[key]
+        finally:
+            self.loading.pop(key, None)
+        if key not in self.sessions:
+            # The answer store is only used from the thread of the event loop.
+            session.restore()
+            self.sessions[key] = session
+            while len(self.sessions) > self.maxModels:
+                self.sessions.popitem(last=False)
+        return session, False
+
+    def build(self, key, arguments, compact):
+        model = CFMmodel(engine=self.engine, mutationsFile=None, compact=compact, **arguments)
+        return CFMSession(key, model, self.store)
+
+    def session(self, key):
+        if key not in self.sessions:
+            raise CFMRequestError(HTTPStatus.NOT_FOUND, "Unknown model " + key + ", please load it first.")
+        self.sessions.move_to_end(key)
+        return self.sessions[key]
+
+    # ---------------------------
+    # -------- REQUESTS ---------
+    # ---------------------------
+
+    async def dispatch(self, method, target, body):
+        """
+        Returns the (status, JSON payload) answering the request method target with body.
+        """
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            request = json.loads(body) if body else {}
+        except ValueError:
+            raise CFMRequestError(HTTPStatus.BAD_REQUEST, "The body of the request is not valid JSON.")
+        if not isinstance(request, dict):
+            raise CFMRequestError(HTTPStatus.BAD_REQUEST, "The body of the request must be a JSON object.")
+        offset, limit = int(query.get("offset", 0)), query.get("limit")
+        window = slice(offset, None if limit is None else offset + int(limit))
+
+        if parts == ["health"] and method == "GET":
+            return HTTPStatus.OK, {"status": "ok", "models": len(self.sessions)}
+        if parts == ["models"] and method == "GET":
+            return HTTPStatus.OK, {"models": list(self.sessions)}
+        if parts == ["models"] and method == "POST":
+            try:
+                session, cached = await self.load(request)
+            except CFMValidationError as error:
+                raise CFMRequestError(HTTPStatus.UNPROCESSABLE_ENTITY, str(error),
+                                      errors=[str(issue) for issue in error.errors])
+            except CFMCompiledError as error:
+                raise CFMRequestError(HTTPStatus.UNPROCESSABLE_ENTITY, str(error))
+            except OSError as error:
+                raise CFMRequestError(HTTPStatus.NOT_FOUND, str(error))
+            return HTTPStatus.OK, dict(session.summary(), cached=cached)
+        if len(parts) < 2 or parts[0] != "models":
+            raise CFMRequestError(HTTPStatus.NOT_FOUND, "Unknown request " + method + " " + url.path + ".")
+
+        session = self.session(parts[1])
+        model = session.model
+        if parts[2:] == [] and method == "GET":
+            return HTTPStatus.OK, session.summary()
+        if parts[2:] == [] and method == "DELETE":
+            del self.sessions[parts[1]]
+            return HTTPStatus.OK, {"model": parts[1], "evicted": True}
+        if parts[2:] == ["pairs"] and method == "GET":
+            return HTTPStatus.OK, {"total": len(model.connectedPairs),
+                                   "pairs": [pair.asDict() for pair in model.connectedPairs[window]]}
+        if parts[2:] == ["mapping"] and method == "GET":
+            if "context" in query:
+                return HTTPStatus.OK, {"context": query["context"],
+                                       "features": sorted(model.mapping.featuresOf(query["context"]))}
+            if "feature" in query:
+                return HTTPStatus.OK, {"feature": query["feature"],
+                                       "contexts": sorted(model.mapping.contextsOf(query["feature"]))}
+            return HTTPStatus.OK, model.mapping.asDict()
+        if parts[2:] == ["mutants"] and method == "GET":
+            items = list(zip(model.mutants, model.questions))[window]
+            return HTTPStatus.OK, {"total": len(model.mutants),
+                                   "mutants": [dict(mutant.asDict(), mutation=question['mutation'],
+                                                    signature=question['signature']) for mutant, question in items]}
+        if parts[2:] == ["questions"] and method == "GET":
+            indexes = range(1, len(session.groups) + 1)[window]
+            return HTTPStatus.OK, {"total": len(session.groups),
+                                   "questions": [{"index": index, "question": session.groups[index - 1][0]['question'],
+                                                  "mutation": session.groups[index - 1][0]['mutation'],
+                                                  "mutants": len(session.groups[index - 1][1]),
+                                                  "answer": session.answers.get(index)} for index in indexes]}
+        if parts[2:] == ["answers"] and method == "POST":
+            survived = session.answer(request.get("index"), request.get("answer"))
+            return HTTPStatus.OK, {"index": request["index"], "answer": session.answers[request["index"]],
+                                   "survived": survived, "answered": len(session.answers)}
+        if parts[2:] == ["result"] and method == "GET":
+            return HTTPStatus.OK, dict(session.result().asDict(), answered=len(session.answers),
+                                       mutants=len(model.mutants))
+        raise CFMRequestError(HTTPStatus.NOT_FOUND, "Unknown request " + method + " " + url.path + ".")
+
+    async def handle(self, reader, writer):
+        """
+        Serves the HTTP/1.1 requests of a client connection (kept alive unless the client closes it). Every request
+        is answered with a JSON body, {"error": message} with a 4xx or 500 status when it fails.
+        """
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine.strip():
+                    break
+                method, target, version = requestLine.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, separator, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except CFMRequestError as error:
+                    status, payload = error.status, dict(error.details, error=str(error))
+                except ValueError as error:
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": str(error)}
+                except Exception as error:
+                    # Any other error is answered too, so that the client is not disconnected.
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": type(error).__name__ + ": " +
+                                                                                  str(error)}
+                data = json.dumps(payload).encode()
+                keepAlive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(("HTTP/1.1 " + str(status.value) + " " + status.phrase + "\r\n"
+                              "Content-Type: application/json\r\n"
+                              "Content-Length: " + str(len(data)) + "\r\n"
+                              "Connection: " + ("keep-alive" if keepAlive else "close") + "\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, unixSocket=None):
+        """
+        Serves the requests on host:port, or on unixSocket if it is given, until cancelled.
+        """
+        if unixSocket is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unixSocket)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,99 @@
+# Author: Audric Deckers
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter
+
+# Phases of the construction of a CFMmodel, in order.
+PHASES = ["processCFFiles", "processMappingFile", "generateConnectedPairs", "generateMutants"]
+
+# Mutation operators applied by generateMutants.
+OPERATORS = ["AltToOr", "OrToAlt", "OrToOpt", "ManToOpt"]
+
+class CFMStats:
+    """
+    Instrumentation of a CFMmodel: wall time and tracemalloc peak of each phase, and counters of the
+    connected pairs and mutants generation.
+    """
+    def __init__(self, memory=False):
+        # Whether the tracemalloc peak of each phase is recorded (slows the phases down).
+        self.memory = memory
+        self.startedTracing = False
+
+        # Phase -> wall time in ms and peak memory in bytes (None when memory is not recorded).
+        self.times = {phase: 0.0 for phase in PHASES}
+        self.peaks = {phase: None for phase in PHASES}
+
+        # Counters of the connected pairs generation.
+        self.candidatePairs = 0     # (context child, feature child) pairs tested by the python engine, None for
+                                    # the engines that do not test them one by one.
+        self.pairsEmitted = 0       # Connected pairs produced, duplicates included.
+        self.duplicatesDropped = 0  # Connected pairs produced more than once.
+
+        # Result of the cache lookup, either "hit" or "miss" (None when no cache is used).
+        self.cache = None
+
+        # Operator -> number of mutants generated.
+        self.mutants = {operator: 0 for operator in OPERATORS}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Records the wall time (and the tracemalloc peak, if enabled) of the enclosed block under name.
+        """
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.startedTracing = True
+            tracemalloc.reset_peak()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + (perf_counter() - start) * 1000
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peaks[name] = max(self.peaks.get(name) or 0, peak)
+
+    def stop(self):
+        """
+        Stops tracemalloc if it was started by these stats.
+        """
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
+
+    def countCandidates(self, candidates):
+        if self.candidatePairs is not None:
+            self.candidatePairs += candidates
+
+    def countMutant(self, operator):
+        self.mutants[operator] = self.mutants.get(operator, 0) + 1
+
+    def total(self):
+        return sum(self.times.values())
+
+    def asDict(self):
+        return {"cache": self.cache, "times": dict(self.times), "peaks": dict(self.peaks), "candidatePairs": self.candidatePairs,
+                "pairsEmitted": self.pairsEmitted, "duplicatesDropped": self.duplicatesDropped,
+                "mutants": dict(self.mutants)}
+
+    def report(self):
+        """
+        Returns a printable report of the phases and counters.
+        """
+        lines = ["Profile of the CFM model:"]
+        if self.cache is not None:
+            lines.append("  Cache " + self.cache)
+        for phase in self.times:
+            line = "  " + phase.ljust(24) + str(round(self.times[phase], 3)).rjust(12) + " ms"
+            if self.peaks.get(phase) is not None:
+                line += str(round(self.peaks[phase] / 1024, 1)).rjust(12) + " KiB peak"
+            lines.append(line)
+        lines.append("  " + "Total".ljust(24) + str(round(self.total(), 3)).rjust(12) + " ms")
+        lines.append("Candidate child pairs examined: " +
+                     ("not measured by this engine" if self.candidatePairs is None else str(self.candidatePairs)))
+        lines.append("Connected pairs emitted: " + str(self.pairsEmitted) +
+                     " (" + str(self.duplicatesDropped) + " duplicates dropped)")
+        lines.append("Mutants per operator: " +
+                     ", ".join(operator + "=" + str(count) for operator, count in self.mutants.items()))
+        return "\n".join(lines)
@@ -0,0 +1,241 @@
+# Author: Audric Deckers
+import os
+from collections import Counter
+from CFMnode import *
+
+# Constraints accepted in the contexts and features files (case insensitive).
+CONSTRAINTS = ["mandatory", "optional", "or", "alternative"]
+
+# Kinds of issues that do not prevent the model from being analysed: the duplicate children are merged and the orphan
+# parents are attached to the root (cfr. CFMRegistry.finalize).
+WARNINGS = ["duplicate", "orphan"]
+
+class CFMIssue:
+    """
+    Problem found in a model file: its kind (missing, malformed, constraint, undefined, duplicate, cycle or orphan),
+    the file and line (starting at 1, None for the whole file) where it was found and a readable message.
+    """
+    __slots__ = ('kind', 'file', 'line', 'message')
+
+    def __init__(self, kind, file, line, message):
+        self.kind = kind
+        self.file = file
+        self.line = line
+        self.message = message
+
+    def __repr__(self):
+        return "CFMIssue(" + self.kind + ", " + str(self) + ")"
+
+    def __str__(self):
+        location = self.file if self.line is None else self.file + ":" + str(self.line)
+        return location + ": " + self.message
+
+    @property
+    def error(self):
+        return self.kind not in WARNINGS
+
+class CFMValidationError(Exception):
+    """
+    Raised when a model has errors, all of them being listed in self.errors (and the warnings in self.warnings).
+    """
+    def __init__(self, errors, warnings=()):
+        self.errors = list(errors)
+        self.warnings = list(warnings)
+        super().__init__(str(len(self.errors)) + " error(s) in the model:\n" +
+                         "\n".join("  " + str(issue) for issue in self.errors))
+
+class CFMValidator:
+    """
+    Streaming validator of the contexts, features and mapping files. The relationships and mapping lines are yielded
+    as they are read (so that the model is built in the same pass) and every problem is recorded with its file and
+    line instead of stopping at the first one. The checks needing the whole trees (cycles and orphan parents) are run
+    by check(), which raises a CFMValidationError if any error was found.
+    """
+    def __init__(self):
+        self.issues = []
+        # Parent -> list of children, parent -> line of its first relationship, and names listed as a child, for each
+        # model type.
+        self.children = {modelType: {} for modelType in ROOTS}
+        self.lines = {modelType: {} for modelType in ROOTS}
+        self.childNames = {modelType: set() for modelType in ROOTS}
+        self.files = {}
+        self.checked = False
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.error]
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if not issue.error]
+
+    def report(self, kind, file, line, message):
+        self.issues.append(CFMIssue(kind, os.path.basename(file) if file else str(file), line, message))
+
+    def defined(self, name, modelType):
+        return name in self.children[modelType] or name in self.childNames[modelType]
+
+    def open(self, filename, description):
+        """
+        Returns filename opened, or None after recording it as missing.
+        """
+        if filename is None:
+            self.report("missing", description, None, "Please, provide a valid " + description + " file.")
+            return None
+        try:
+            return open(filename)
+        except OSError as error:
+            self.report("missing", filename, None, "cannot be read (" + error.strerror + ").")
+            return None
+
+    # ---------------------------
+    # --------- STREAMS ---------
+    # ---------------------------
+
+    def iterRelations(self, filename, modelType):
+        """
+        Yields the (parent, constraint, children) relationships of the valid lines of the modelType file.
+        """
+        children, lines, childNames = self.children[modelType], self.lines[modelType], self.childNames[modelType]
+        self.files[modelType] = filename
+        f = self.open(filename, modelType + ".txt")
+        if f is None:
+            return
+        with f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                # row[0] = parent, row[1] = constraint, row[2] = children
+                row = line.split('/')
+                if len(row) != 3 or not row[0] or '' in row[2].split('-'):
+                    self.report("malformed", filename, number, "'" + line + "' does not seem to define a valid "
+                                "relationship (parent/constraint/child-child-...).")
+                    continue
+                if row[1].lower() not in CONSTRAINTS:
+                    self.report("constraint", filename, number, "unknown constraint '" + row[1] + "', expected one "
+                                "of Mandatory, Optional, Or and Alternative.")
+                    continue
+                parent, constraint, rowChildren = row[0], row[1], row[2].split('-')
+                if len(set(rowChildren)) != len(rowChildren):
+                    duplicates = sorted(set(child for child in rowChildren if rowChildren.count(child) > 1))
+                    self.report("duplicate", filename, number, "the children " + ", ".join(duplicates) +
+                                " of " + parent + " are listed more than once.")
+                lines.setdefault(parent, number)
+                siblings = children.setdefault(parent, [])
+                childNames.update(rowChildren)
+                siblings.extend(rowChildren)
+                yield parent, constraint, rowChildren
+
+    def iterMapping(self, filename):
+        """
+        Yields the (contexts, features) name lists of the valid lines of the mapping file, read after the contexts and
+        features files. Hyphenated names (e.g. 'A-B-ACTIVATES-C') are split into their nodes.
+        """
+        f = self.open(filename, "mapping.txt")
+        if f is None:
+            return
+        with f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                # Extract Contexts-ACTIVATES-Features
+                row = line.split('-ACTIVATES-')
+                if len(row) != 2:
+                    self.report("malformed", filename, number, "'" + line + "' does not seem to define a valid "
+                                "mapping (contexts-ACTIVATES-features).")
+                    continue
+                mapContexts, mapFeatures = [[elem for name in side.split() for elem in name.split('-')] for side in row]
+                valid = True
+                for names, modelType in [(mapContexts, "contexts"), (mapFeatures, "features")]:
+                    for elem in names:
+                        if not self.defined(elem, modelType):
+                            self.report("undefined", filename, number, "the " + modelType[:-1] + " '" + elem +
+                                        "' does not seem to be defined in " + modelType + ".txt.")
+                            valid = False
+                if valid:
+                    yield mapContexts, mapFeatures
+
+    # ---------------------------
+    # ------- TREE CHECKS -------
+    # ---------------------------
+
+    def checkTrees(self):
+        """
+        Records the cycles and the orphan parents (never listed as a child, except the root) of both trees.
+        """
+        for modelType, root in ROOTS.items():
+            children, lines, childNames = self.children[modelType], self.lines[modelType], self.childNames[modelType]
+            filename = self.files.get(modelType)
+            for parent in children:
+                if parent != root and parent not in childNames:
+                    self.report("orphan", filename, lines[parent], "the parent " + parent + " is not the child of "
+                                "any relationship, it is attached to " + root + ".")
+            for cycle in self.cycles(children):
+                self.report("cycle", filename, lines[cycle[0]], "the relationships form a cycle: " +
+                            " -> ".join(cycle + [cycle[0]]) + ".")
+
+    def cycles(self, children):
+        """
+        Yields one cycle (list of names) per back edge of children. The nodes outside any cycle are first peeled off in
+        topological order (Kahn), so that the depth-first search only runs on the cycles and their descendants.
+        """
+        indegree = Counter(child for siblings in children.values() for child in siblings)
+        queue = [name for name in children if name not in indegree]
+        while queue:
+            for child in children.get(queue.pop(), ()):
+                indegree[child] -= 1
+                if not indegree[child]:
+                    queue.append(child)
+        remaining = dict.fromkeys(name for name, degree in indegree.items() if degree)
+
+        # 1 while on the current path, 2 once all the descendants are visited.
+        state = {}
+        for start in remaining:
+            if start in state:
+                continue
+            path = [start]
+            stack = [iter(children.get(start, ()))]
+            state[start] = 1
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    state[path.pop()] = 2
+                    stack.pop()
+                elif child not in remaining:
+                    continue
+                elif state.get(child) == 1:
+                    yield path[path.index(child):]
+                elif child not in state:
+                    state[child] = 1
+                    path.append(child)
+                    stack.append(iter(children.get(child, ())))
+
+    def finish(self):
+        """
+        Runs the tree checks once the files are read (only once) and returns the issues found.
+        """
+        if not self.checked:
+            self.checkTrees()
+            self.checked = True
+        return self.issues
+
+    def check(self):
+        """
+        Raises a CFMValidationError listing every error found, if there is any.
+        """
+        self.finish()
+        if self.errors:
+            raise CFMValidationError(self.errors, self.warnings)
+
+    def validate(self, contextsFile, featuresFile, mappingFile):
+        """
+        Validates the three files of a model without building it, and returns the issues found.
+        """
+        for modelType, filename in [("contexts", contextsFile), ("features", featuresFile)]:
+            for relation in self.iterRelations(filename, modelType):
+                pass
+        for mapping in self.iterMapping(mappingFile):
+            pass
+        return self.finish()
@@ -0,0 +1,97 @@
+import argparse
+import io
+import json
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from time import perf_counter
+from CFMmodel import *
+# Author: Audric Deckers - Testing the design of context-oriented software through mutation testing.
+# Analyses every model (contexts.txt, features.txt and mapping.txt) found under a directory in parallel,
+# writes the connected pairs and mutants of each model in its own output directory and a NDJSON summary.
+
+def discoverModels(root):
+    """
+    Returns the sorted list of directories under root that contain the three files of a model.
+    """
+    models = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        if all(name in files for name in MODEL_FILES):
+            models.append(directory)
+    return sorted(models)
+
+def modelName(root, directory):
+    """
+    Returns the name of the model in directory, unique under root (e.g. 'examples__big').
+    """
+    name = os.path.relpath(directory, root)
+    return "root" if name == "." else name.replace(os.sep, "__")
+
+def analyseModel(root, directory, output, engine, report="text"):
+    """
+    Analyses the model in directory and writes its mutation report (mutations.txt by default, cfr. CFMreport.py) and
+    model.json in output/<name>/.
+    Returns the summary record of the model; a failure is reported in the record instead of being raised.
+    """
+    name = modelName(root, directory)
+    outputDirectory = os.path.join(output, name)
+    record = {"model": name, "path": directory, "output": outputDirectory}
+    messages = io.StringIO()
+    start = perf_counter()
+    try:
+        os.makedirs(outputDirectory, exist_ok=True)
+        files = [os.path.join(directory, filename) for filename in MODEL_FILES]
+        with redirect_stdout(messages):
+            cfmmodel = CFMmodel(*files, engine=engine, report=report,
+                                mutationsFile=os.path.join(outputDirectory, "mutations" + EXTENSIONS.get(report, "")))
+        with open(os.path.join(outputDirectory, "model.json"), "w") as f:
+            json.dump({"connectedPairs": [pair.asDict() for pair in cfmmodel.connectedPairs],
+                       "mutants": [mutant.asDict() for mutant in cfmmodel.mutants],
+                       "questions": cfmmodel.questions}, f)
+        record.update({"status": "ok", "contexts": len(cfmmodel.contexts), "features": len(cfmmodel.features),
+                       "connectedPairs": len(cfmmodel.connectedPairs), "mutants": len(cfmmodel.mutants),
+                       "questions": len(cfmmodel.questions)})
+    except CFMValidationError as error:
+        # Every error of the model is kept in the record, with its file and line.
+        record.update({"status": "error", "error": str(error),
+                       "errors": [{"kind": issue.kind, "file": issue.file, "line": issue.line,
+                                   "message": issue.message} for issue in error.errors]})
+    except SystemExit:
+        record.update({"status": "error", "error": messages.getvalue().strip() or "Invalid model."})
+    except Exception:
+        record.update({"status": "error", "error": traceback.format_exc(limit=1).strip()})
+    record["time"] = (perf_counter() - start) * 1000
+    return record
+
+def runBatch(root, output, workers=None, engine="python", report="text"):
+    """
+    Analyses every model under root with a pool of workers and writes output/summary.ndjson.
+    Returns the summary records, in the order of the models.
+    """
+    models = discoverModels(root)
+    os.makedirs(output, exist_ok=True)
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+         open(os.path.join(output, "summary.ndjson"), "w") as summary:
+        futures = [executor.submit(analyseModel, root, directory, output, engine, report) for directory in models]
+        for future in futures:
+            record = future.result()
+            summary.write(json.dumps(record) + "\n")
+            records.append(record)
+            print(record["status"].upper().ljust(6) + record["model"])
+    return records
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyses every CFM model found under a directory in parallel.")
+    parser.add_argument("root", help="directory searched for contexts.txt, features.txt and mapping.txt triples")
+    parser.add_argument("--output", default="results/batch", help="directory of the per-model outputs and summary.ndjson")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--engine", choices=ENGINES, default="python")
+    parser.add_argument("--report", choices=SINKS, default="text", help="format of the per-model mutation reports")
+    args = parser.parse_args()
+
+    records = runBatch(args.root, args.output, args.workers, args.engine, args.report)
+    failures = sum(1 for record in records if record["status"] != "ok")
+    print(str(len(records)) + " models analysed, " + str(failures) + " failed.")
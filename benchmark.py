@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import tempfile
+from CFMmodel import *
+from generator import *
+# Author: Audric Deckers - Testing the design of context-oriented software through mutation testing.
+# Sweeps synthetic CFM models of increasing size and records the time of each phase and the peak memory.
+
+# Number of nodes (contexts + features) of the generated models.
+SIZES = [100, 1000, 10000, 100000]
+
+# Default NDJSON files of the results, the speedup records having their own fields (cfr. runSpeedup and graphs.py).
+BENCHMARK_FILE = "results/benchmark.ndjson"
+SPEEDUP_FILE = "results/speedup.ndjson"
+
+def measure(files, engine, repeat, compact=False):
+    """
+    Returns the average timings of repeat constructions of the model, then its peak memory
+    measured in a separate traced construction. The mutations are not logged, so that no file is written.
+    """
+    timings = {}
+    for i in range(repeat):
+        model = CFMmodel(*files, engine=engine, mutationsFile=None, compact=compact)
+        times = model.stats.times
+        for phase, value in [("parsing", times["processCFFiles"] + times["processMappingFile"]),
+                             ("connectedPairs", times["generateConnectedPairs"]), ("mutants", times["generateMutants"])]:
+            timings[phase] = timings.get(phase, 0.0) + value / repeat
+
+    profiled = CFMmodel(*files, engine=engine, profile=True, mutationsFile=None, compact=compact)
+    peak = max(profiled.stats.peaks.values())
+
+    return {"contexts": len(model.contexts), "features": len(model.features),
+            "mapping": sum(1 for line in open(files[2]) if line.strip()),
+            "connectedPairs": len(model.connectedPairs), "mutants": len(model.mutants),
+            "questions": len(model.questions), "timings": timings,
+            "total": sum(timings.values()), "peakMemory": peak, "stats": model.stats.asDict()}
+
+def runBenchmark(sizes, output, engine="python", depth=6, fanout=8, density=0.3, repeat=1, seed=0, compact=False):
+    """
+    Generates a model for each size, measures it and appends one JSON record per model to output.
+    """
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory() as path, open(output, "a") as results:
+        for size in sizes:
+            files = generateModel(os.path.join(path, str(size)), size // 2, size - size // 2,
+                                  depth, fanout, density=density, seed=seed)
+            record = {"nodes": size, "engine": engine, "compact": compact, "depth": depth, "fanout": fanout,
+                      "density": density, "seed": seed}
+            record.update(measure(files, engine, repeat, compact))
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+            print(str(size) + " nodes: " + str(round(record["total"], 3)) + " ms, peak memory " +
+                  str(record["peakMemory"] // 1024) + " KiB")
+
+def speedup(files, workers):
+    """
+    Returns the time of the connected pairs generation of the "python" and "parallel" engines and their speedup,
+    after checking that both generate the same connected pairs in the same order.
+    """
+    serial = CFMmodel(*files, engine="python", mutationsFile=None)
+    parallel = CFMmodel(*files, engine="parallel", workers=workers, mutationsFile=None)
+    if serial.connectedPairs != parallel.connectedPairs:
+        raise AssertionError("The parallel engine does not match the serial one on " + files[0])
+    serialTime = serial.stats.times["generateConnectedPairs"]
+    parallelTime = parallel.stats.times["generateConnectedPairs"]
+    return {"serial": serialTime, "parallel": parallelTime, "speedup": serialTime / parallelTime,
+            "connectedPairs": len(serial.connectedPairs)}
+
+def runSpeedup(sizes, output, workers=None, depth=6, fanout=8, density=0.3, seed=0):
+    """
+    Measures the speedup of the "parallel" engine on the big example and on a generated model for each size,
+    and appends one JSON record per model to output.
+    """
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    big = 'models/examples/big/'
+    with tempfile.TemporaryDirectory() as path, open(output, "a") as results:
+        models = [("big", [big+name for name in MODEL_FILES])]
+        for size in sizes:
+            models.append((size, generateModel(os.path.join(path, str(size)), size // 2, size - size // 2,
+                                               depth, fanout, density=density, seed=seed)))
+        for name, files in models:
+            record = {"model": name, "engine": "parallel", "workers": workers or os.cpu_count()}
+            record.update(speedup(files, workers))
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+            print(str(name) + ": serial " + str(round(record["serial"], 3)) + " ms, parallel " +
+                  str(round(record["parallel"], 3)) + " ms, speedup x" + str(round(record["speedup"], 2)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks CFMmodel on synthetic models of increasing size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="number of nodes of each model")
+    parser.add_argument("--output", default=None, help="NDJSON file the results are appended to (default: " +
+                        BENCHMARK_FILE + ", or " + SPEEDUP_FILE + " with --speedup)")
+    parser.add_argument("--engine", choices=ENGINES, default="python")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=1, help="number of timed constructions per model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--speedup", action="store_true",
+                        help="measure the speedup of the parallel engine over the python one instead")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes of the parallel engine")
+    parser.add_argument("--compact", action="store_true", help="use the array-backed model representation")
+    args = parser.parse_args()
+
+    if args.speedup:
+        runSpeedup(args.sizes, args.output or SPEEDUP_FILE, args.workers, args.depth, args.fanout, args.density, args.seed)
+    else:
+        runBenchmark(args.sizes, args.output or BENCHMARK_FILE, args.engine, args.depth, args.fanout, args.density, args.repeat, args.seed,
+                     args.compact)
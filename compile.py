@@ -0,0 +1,17 @@
+import argparse
+import os
+from CFMmodel import *
+# Author: Audric Deckers - Testing the design of context-oriented software through mutation testing.
+# Compiles the text files of a model (contexts.txt, features.txt and mapping.txt) into a single validated file
+# loaded by CFMmodel(compiled=...) without parsing the text again.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiles a CFM model into a file loaded without parsing.")
+    parser.add_argument("directory", help="directory containing contexts.txt, features.txt and mapping.txt")
+    parser.add_argument("--output", default=None, help="compiled file (default: model.cfm in the directory)")
+    args = parser.parse_args()
+
+    files = [os.path.join(args.directory, name) for name in MODEL_FILES]
+    output = args.output or os.path.join(args.directory, "model.cfm")
+    CFMmodel(*files, lazy=True, mutationsFile=None).compile(output)
+    print("Compiled " + args.directory + " into " + output + ".")
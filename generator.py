@@ -0,0 +1,109 @@
+import argparse
+import os
+import random
+# Author: Audric Deckers - Testing the design of context-oriented software through mutation testing.
+# Generates synthetic CFM models (contexts.txt, features.txt and mapping.txt) of a chosen size and shape.
+
+# Default weights of the constraints used for the relationships below the roots.
+CONSTRAINTS = {"Alternative": 0.35, "Or": 0.35, "Optional": 0.15, "Mandatory": 0.15}
+
+def generateTree(root, prefix, nbrNodes, depth, fanout, constraints, rnd):
+    """
+    Returns the lines 'parent/constraint/children' of a tree of nbrNodes nodes (root excluded) named prefix+i,
+    built breadth first with at most depth levels below the root and between 2 and fanout children per parent.
+    """
+    if nbrNodes > sum(fanout ** level for level in range(1, depth + 1)):
+        raise ValueError("Cannot fit " + str(nbrNodes) + " nodes in a tree of depth " + str(depth) +
+                         " and fan-out " + str(fanout) + ".")
+    names = list(constraints)
+    weights = [constraints[name] for name in names]
+    lines = []
+    created = 0
+    frontier = [root]
+    level = 0
+    while created < nbrNodes and frontier:
+        # Each child at this level can hold itself and a full subtree below it.
+        capacity = sum(fanout ** i for i in range(depth - level))
+        required = -(-(nbrNodes - created) // capacity)
+        nextFrontier = []
+        for i, parent in enumerate(frontier):
+            left = nbrNodes - created
+            if left == 0:
+                break
+            # Draw the number of children, but keep enough room for the nodes left.
+            minimum = required - len(nextFrontier) - (len(frontier) - i - 1) * fanout
+            nbrChildren = min(left, fanout, max(minimum, rnd.randint(min(2, fanout), fanout)))
+            children = [prefix + str(created + j) for j in range(nbrChildren)]
+            created += nbrChildren
+            if parent == root:
+                # Roots are split into a mandatory and an optional relationship, as in the examples.
+                half = max(1, len(children) // 2)
+                lines.append(parent + "/Mandatory/" + "-".join(children[:half]))
+                if children[half:]:
+                    lines.append(parent + "/Optional/" + "-".join(children[half:]))
+            else:
+                constraint = rnd.choices(names, weights)[0]
+                lines.append(parent + "/" + constraint + "/" + "-".join(children))
+            nextFrontier.extend(children)
+        frontier = nextFrontier
+        level += 1
+    return lines
+
+def generateMapping(contexts, features, density, rnd):
+    """
+    Returns round(density * len(contexts)) lines 'C-...-ACTIVATES-F-...' linking one or two contexts
+    to one to three features.
+    """
+    lines = []
+    for i in range(round(density * len(contexts))):
+        mapContexts = rnd.sample(contexts, min(len(contexts), 1 if rnd.random() < 0.8 else 2))
+        mapFeatures = rnd.sample(features, min(len(features), rnd.randint(1, 3)))
+        lines.append("-".join(mapContexts) + "-ACTIVATES-" + "-".join(mapFeatures))
+    return lines
+
+def generateModel(path, nbrContexts, nbrFeatures, depth=3, fanout=4, constraints=None, density=0.3, seed=0):
+    """
+    Writes contexts.txt, features.txt and mapping.txt of a synthetic CFM model in path and returns
+    the paths of the three files.
+    """
+    rnd = random.Random(seed)
+    constraints = constraints or CONSTRAINTS
+    contexts = generateTree("Context", "C", nbrContexts, depth, fanout, constraints, rnd)
+    features = generateTree("Feature", "F", nbrFeatures, depth, fanout, constraints, rnd)
+    mapping = generateMapping(["C" + str(i) for i in range(nbrContexts)],
+                              ["F" + str(i) for i in range(nbrFeatures)], density, rnd)
+
+    os.makedirs(path, exist_ok=True)
+    files = []
+    for name, lines in [("contexts", contexts), ("features", features), ("mapping", mapping)]:
+        filename = os.path.join(path, name + ".txt")
+        with open(filename, "w") as f:
+            f.write("\n".join(lines))
+        files.append(filename)
+    return files
+
+def parseConstraints(text):
+    """
+    Parses a constraint mix such as 'Alternative=2,Or=1,Optional=1,Mandatory=1'.
+    """
+    constraints = {}
+    for item in text.split(","):
+        name, weight = item.split("=")
+        constraints[name] = float(weight)
+    return constraints
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic CFM model.")
+    parser.add_argument("path", help="directory where contexts.txt, features.txt and mapping.txt are written")
+    parser.add_argument("--contexts", type=int, default=50, help="number of contexts (root excluded)")
+    parser.add_argument("--features", type=int, default=50, help="number of features (root excluded)")
+    parser.add_argument("--depth", type=int, default=3, help="maximum depth below the roots")
+    parser.add_argument("--fanout", type=int, default=4, help="maximum number of children per relationship")
+    parser.add_argument("--constraints", type=parseConstraints, default=CONSTRAINTS,
+                        help="constraint mix, e.g. Alternative=2,Or=1,Optional=1,Mandatory=1")
+    parser.add_argument("--density", type=float, default=0.3, help="number of mapping lines per context")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generateModel(args.path, args.contexts, args.features, args.depth, args.fanout, args.constraints, args.density, args.seed)
+    print("Model generated in " + args.path)
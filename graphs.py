@@ -1,5 +1,10 @@
+import json
+import os
 import matplotlib.pyplot as plt
 
+# Results measured by benchmark.py, plotted when the file exists.
+resultsFile = 'results/benchmark.ndjson'
+
 # Data
 contexts = [3, 6, 11, 20, 25, 60]
 features = [3, 7, 18, 27, 32, 60]
@@ -60,4 +65,52 @@ plt.legend()
 plt.savefig('AnalysisMutant')
 
 # Show the graph
-plt.show()
\ No newline at end of file
+plt.show()
+
+# Measured data (cfr. benchmark.py)
+if os.path.exists(resultsFile):
+    with open(resultsFile) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    # Speedup records (cfr. benchmark.py --speedup) written to this file by an --output option are left out.
+    records = [record for record in records if 'timings' in record]
+    # One series per engine and representation (cfr. benchmark.py --compact).
+    series = lambda record: (record['engine'], record.get('compact', False))
+    label = lambda key: key[0] + (' (compact)' if key[1] else '')
+
+    # Create the graph
+    plt.figure(figsize=(10, 6))
+    for key in sorted(set(series(record) for record in records)):
+        runs = sorted((record for record in records if series(record) == key), key=lambda record: record['nodes'])
+        sizes = [record['nodes'] for record in runs]
+        for phase in ['parsing', 'connectedPairs', 'mutants']:
+            plt.plot(sizes, [record['timings'][phase] for record in runs], marker='o', label=label(key)+' - '+phase)
+
+    # Customize the graph
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.xlabel('Number of Nodes (Contexts + Features)')
+    plt.ylabel('Time[ms]')
+    plt.title('Measured Time of each phase with respect to Number of Contexts and Features')
+    plt.legend()
+    plt.savefig('AnalysisBenchmark')
+
+    # Show the graph
+    plt.show()
+
+    # Create the graph
+    plt.figure(figsize=(10, 6))
+    for key in sorted(set(series(record) for record in records)):
+        runs = sorted((record for record in records if series(record) == key), key=lambda record: record['nodes'])
+        plt.plot([record['nodes'] for record in runs], [record['peakMemory'] / 2**20 for record in runs], marker='o', label=label(key))
+
+    # Customize the graph
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.xlabel('Number of Nodes (Contexts + Features)')
+    plt.ylabel('Peak memory[MiB]')
+    plt.title('Measured Peak memory with respect to Number of Contexts and Features')
+    plt.legend()
+    plt.savefig('AnalysisMemory')
+
+    # Show the graph
+    plt.show()
@@ -1,3 +1,5 @@
+import argparse
+import sys
 from CFMmodel import *
 # Author: Audric Deckers - Testing the design of context-oriented software through mutation testing.
 # Version: May 2023
@@ -6,11 +8,48 @@ contextsFile=None
 featuresFile=None
 mappingFile=None
 
-# Instantiates the CFMmodel class
-cfmmodel = CFMmodel(contextsFile, featuresFile, mappingFile)
+parser = argparse.ArgumentParser(description="Launches the recommendation system on a CFM model.")
+parser.add_argument("--profile", action="store_true", help="print the time, peak memory and counters of each phase")
+parser.add_argument("--cache", action="store_true", help="reuse the model and mutants cached by previous runs")
+parser.add_argument("--lazy", action="store_true", help="generate the questions on demand instead of before the first one")
+parser.add_argument("--compact", action="store_true", help="use the array-backed model representation (for very large models)")
+parser.add_argument("--optional-operators", action="store_true", help="also apply the optional mutation operators (OptToMan, ManToAlt)")
+parser.add_argument("--compiled", help="compiled model (cfr. compile.py) loaded instead of the txt files")
+parser.add_argument("--answers", help="file of answers (one per line, in the order of the questions) replacing the interactive questions")
+parser.add_argument("--store", nargs="?", const="", help="reuse and record the answers in an answer store (default: ~/.cache/TFEmutaCOP/answers.sqlite)")
+parser.add_argument("--report", choices=SINKS, default="text", help="format of the mutation report: none, text (default), ndjson or csv")
+parser.add_argument("--report-file", default=MUTATIONS_FILE, help="file of the mutation report (default: " + MUTATIONS_FILE + ")")
+parser.add_argument("--report-thread", action="store_true", help="write the mutation report from a background thread")
+parser.add_argument("--auto", action="store_true", help="kill the mutants changing the valid configurations without any question")
+args = parser.parse_args()
 
-# Launches the recommendation system
-cfmmodel.launchRecommendationSystem
+# Instantiates the CFMmodel class, reporting every error of the model files at once
+try:
+    cfmmodel = CFMmodel(contextsFile, featuresFile, mappingFile, profile=args.profile, lazy=args.lazy,
+                        cache=CFMCache() if args.cache else None, compact=args.compact, compiled=args.compiled,
+                        operators=CFMOperatorRegistry(DEFAULT_OPERATORS + OPTIONAL_OPERATORS) if args.optional_operators else None,
+                        mutationsFile=args.report_file, report=args.report, reportThread=args.report_thread)
+except CFMValidationError as error:
+    print("FORMAT ERROR: " + str(error))
+    sys.exit(1)
+if cfmmodel.validator is not None:
+    for warning in cfmmodel.validator.warnings:
+        print("WARNING: " + str(warning))
+
+# Prints the profiling report
+if args.profile:
+    print(cfmmodel.stats.report())
+
+# Launches the recommendation system, or decides every mutant automatically
+if args.auto:
+    result = cfmmodel.killMutants()
+    print("Mutation score: " + str(result.score[0]) + "/" + str(result.score[1]) + ".")
+    print("Equivalent mutants:")
+    for mutant, question in result.surviving:
+        print("- " + question['mutation'])
+else:
+    cfmmodel.launchRecommendationSystem(CFMFileOracle(args.answers) if args.answers else None,
+                                        store=CFMAnswerStore(args.store or None) if args.store is not None else None)
 
 
 
@@ -0,0 +1,77 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+from CFMmodel import *
+from CFMincremental import *
+# Author: Audric Deckers - Testing the design of context-oriented software through mutation testing.
+# Checks that the "python", "numpy" and "parallel" engines generate the same connected pairs and mutants, and that
+# an incremental re-analysis after editing a file gives the same model as a full rebuild, on every
+# model in models/examples/.
+path = 'models/examples/'
+failures = 0
+
+def sameModel(model, rebuilt):
+    return model.connectedPairs == rebuilt.connectedPairs and model.mutants == rebuilt.mutants and \
+           model.questions == rebuilt.questions and model.mutationsLog == rebuilt.mutationsLog
+
+def edits(lines, rnd):
+    """
+    Yields edited versions of lines: one mapping line dropped, one line duplicated and one constraint changed.
+    """
+    i = rnd.randrange(len(lines))
+    if '-ACTIVATES-' in lines[i]:
+        yield lines[:i] + lines[i+1:]
+    yield lines + [lines[i]]
+    row = lines[i].split('/')
+    if len(row) == 3:
+        row[1] = rnd.choice(["Mandatory", "Optional", "Or", "Alternative"])
+        yield lines[:i] + ['/'.join(row)] + lines[i+1:]
+
+for model in sorted(os.listdir(path)):
+    files = [path+model+'/'+name for name in MODEL_FILES]
+    python = CFMmodel(*files, engine="python")
+    numpy = CFMmodel(*files, engine="numpy")
+    parallel = CFMmodel(*files, engine="parallel", workers=2)
+    samePairs = set(python.connectedPairs) == set(numpy.connectedPairs) and len(python.connectedPairs) == len(numpy.connectedPairs)
+    sameMutants = sorted(m.astuple() for m in python.mutants) == sorted(m.astuple() for m in numpy.mutants)
+    # The parallel engine must also keep the order of the serial one.
+    sameParallel = sameModel(python, parallel)
+    if samePairs and sameMutants and sameParallel:
+        print("OK   "+model+": "+str(len(python.connectedPairs))+" connected pairs")
+    else:
+        print("FAIL "+model+": python="+str(len(python.connectedPairs))+", numpy="+str(len(numpy.connectedPairs))+
+              ", parallel="+str(len(parallel.connectedPairs)))
+        failures += 1
+
+# With the default operators, then with the optional ones too, which the new connected pairs must be mutated with.
+optional = CFMOperatorRegistry(DEFAULT_OPERATORS + OPTIONAL_OPERATORS)
+for operators, label in [(None, ""), (optional, " (optional operators)")]:
+    rnd = random.Random(0)
+    for model in sorted(os.listdir(path)):
+        directory = tempfile.mkdtemp()
+        files = [directory+'/'+name for name in MODEL_FILES]
+        for name in MODEL_FILES:
+            shutil.copy(path+model+'/'+name, directory)
+        incremental = CFMIncremental(CFMmodel(*files, operators=operators))
+        checked = failed = 0
+        for index, filename in enumerate(files):
+            lines = [line for line in open(filename).read().split('\n') if line.strip()]
+            for edited in [edit for k in range(3) for edit in edits(lines, rnd)]:
+                with open(filename, 'w') as f:
+                    f.write('\n'.join(edited))
+                changed = [None, None, None]
+                changed[index] = filename
+                incremental.update(*changed)
+                if not sameModel(incremental.model, CFMmodel(*files, operators=operators)):
+                    print("FAIL "+model+": incremental re-analysis of "+os.path.basename(filename)+" differs from a full rebuild"+label)
+                    failed += 1
+                checked += 1
+        shutil.rmtree(directory)
+        failures += failed
+        if not failed:
+            print("OK   "+model+": "+str(checked)+" incremental re-analyses"+label)
+
+if failures:
+    sys.exit(1)
@@ -0,0 +1,24 @@
+import argparse
+import asyncio
+from CFMserver import *
+# Author: Audric Deckers - Testing the design of context-oriented software through mutation testing.
+# Long-running local analysis service keeping the loaded models and their mutants in memory, so that short scripts
+# (cfr. CFMclient.py) get the connected pairs, mutants and questions of a model without building it again.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the analysis of CFM models over local HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("--unix", default=None, help="Unix socket to listen on instead of host:port")
+    parser.add_argument("--models", type=int, default=8, help="number of models kept in memory (default: 8)")
+    parser.add_argument("--engine", choices=ENGINES, default="python", help="engine for the connected pairs")
+    parser.add_argument("--store", nargs="?", const="", help="reuse and record the answers in an answer store (default: ~/.cache/TFEmutaCOP/answers.sqlite)")
+    args = parser.parse_args()
+
+    store = CFMAnswerStore(args.store or None) if args.store is not None else None
+    service = CFMService(args.models, store, args.engine)
+    print("Serving on " + (args.unix or args.host + ":" + str(args.port)) + ".")
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass